@@ -1,19 +1,16 @@
+# Imports crewai; app.services only loads this module when a job runs.
 from dotenv import load_dotenv
 from crewai import Agent
-from langchain_openai import ChatOpenAI
-from langchain.tools import tool
-import re
-from langchain_community.document_loaders import PyMuPDFLoader
-import os
+from app.llm import get_llm
 
 
 class BlogCreationAgents:
-    def __init__(self):
+    def __init__(self, model_name: str = "gpt-4-turbo"):
         load_dotenv()
         # Retrieve the OpenAI API key from environment variables
         # openai_api_key = os.getenv("OPENAI_API_KEY")
-        self.model = ChatOpenAI(model_name="gpt-4-turbo",
-                                temperature=0.8)
+        self.model = get_llm(model_name=model_name,
+                             temperature=0.8)
 
     def researcher_agent(self):
         return Agent(
@@ -23,7 +20,7 @@ class BlogCreationAgents:
             llm=self.model,
             max_iter=15,
             max_execution_time=60,
-            verbose=True,
+            verbose=False,
             allow_delegation=False,
             cache=True
         )
@@ -36,7 +33,7 @@ class BlogCreationAgents:
             llm=self.model,
             max_iter=15,
             max_execution_time=60,
-            verbose=True,
+            verbose=False,
             allow_delegation=False,
             cache=True
         )
@@ -49,7 +46,7 @@ class BlogCreationAgents:
             llm=self.model,
             max_iter=15,
             max_execution_time=60,
-            verbose=True,
+            verbose=False,
             allow_delegation=False,
             cache=True
         )
@@ -62,7 +59,7 @@ class BlogCreationAgents:
             llm=self.model,
             max_iter=15,
             max_execution_time=60,
-            verbose=True,
+            verbose=False,
             allow_delegation=False,
             cache=True
         )
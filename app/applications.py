@@ -0,0 +1,237 @@
+"""CV and cover letter tailoring across many job postings.
+
+crap/demo.py runs a four-agent crew per posting, and every run re-reads both
+PDFs and re-crawls the posting through the agents' tools. Here:
+
+1. the CV and cover letter are parsed and condensed into a structured
+   profile once, cached by their content;
+2. the postings are fetched concurrently (through the shared tool cache)
+   and reduced to their visible text locally, without a model call;
+3. each posting gets ONE model call that extracts the job's requirements,
+   tailors the CV and cover letter and scores the result as a recruiter;
+4. the postings are ranked by that score.
+
+Model calls share app.llm.rate_limiter, so N postings cost about N single
+calls, started as fast as the rate limit allows.
+
+    python -m app.applications --cv CV.pdf --cover-letter CoverLetter.pdf URL [URL ...]
+"""
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app import seo, settings
+from app.cache import SharedCache, make_key
+from app.tools import fetch_pdf_content, fetch_webpage
+
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+MODEL = "gpt-4-turbo"
+# Bump when the profile prompt changes so cached profiles are rebuilt
+PROFILE_VERSION = 1
+PROFILE_FIELDS = ("name", "headline", "skills", "experience", "education", "achievements",
+                  "cover_letter_points")
+MIN_LINE_WORDS = 3
+
+
+def read_document(path: str) -> str:
+    """Text of a PDF (through the cached PDF tool) or of a text/markdown file."""
+    if path.lower().endswith(".pdf"):
+        return fetch_pdf_content(path)
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _parse_json(reply: str) -> dict:
+    match = JSON_OBJECT_RE.search(reply or "")
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        data = {}
+    return data if isinstance(data, dict) else {}
+
+
+def _ask(prompt: str, fake_response: str, temperature: float = 0.4) -> dict:
+    from app.llm import get_llm
+
+    llm = get_llm(model_name=MODEL, temperature=temperature, fake_response=fake_response)
+    return _parse_json(llm.invoke(prompt).content)
+
+
+def profile_prompt(cv: str, cover_letter: str) -> str:
+    return "\n".join([
+        "Condense this candidate's CV and cover letter into JSON only, with these keys:",
+        '{"name": "", "headline": "", "skills": [""], "experience": [{"role": "", "company": "", '
+        '"years": "", "highlights": [""]}], "education": [""], "achievements": [""], '
+        '"cover_letter_points": [""]}',
+        "Keep every fact, add nothing that is not in the documents.",
+        "", "CV:", cv, "", "Cover letter:", cover_letter])
+
+
+def _fake_profile(cv: str) -> str:
+    words = seo.WORD_RE.findall(cv)
+    return json.dumps({"name": "Candidate", "headline": " ".join(words[:8]),
+                       "skills": sorted({word.lower() for word in words if len(word) > 6})[:15],
+                       "experience": [], "education": [], "achievements": [],
+                       "cover_letter_points": []})
+
+
+def load_profile(cv_path: str, cover_letter_path: str, cache: SharedCache = None) -> dict:
+    """Structured profile of the candidate; one model call per distinct pair of documents."""
+    cache = cache or SharedCache("cv_profile", ttl=0)
+    cv, cover_letter = read_document(cv_path), read_document(cover_letter_path)
+    key = make_key(PROFILE_VERSION, MODEL, cv, cover_letter)
+    profile = cache.get(key)
+    if profile is None:
+        data = _ask(profile_prompt(cv, cover_letter), _fake_profile(cv), temperature=0.0)
+        profile = {field: data.get(field) or ([] if field not in ("name", "headline") else "")
+                   for field in PROFILE_FIELDS}
+        cache.set(key, profile)
+    return profile
+
+
+def posting_text(page: str, limit: int = None) -> dict:
+    """Title and visible text of a job posting page, without navigation-sized fragments."""
+    limit = settings.POSTING_CHARS if limit is None else limit
+    title = TITLE_RE.search(page)
+    lines, seen = [], set()
+    for line in seo.plain_text(page).splitlines():
+        line = " ".join(line.split())
+        if len(line.split()) < MIN_LINE_WORDS or line in seen:
+            continue
+        seen.add(line)
+        lines.append(line)
+    text = "\n".join(lines)
+    return {"title": " ".join(title.group(1).split()) if title else "", "text": text[:limit]}
+
+
+def fetch_posting(url: str) -> dict:
+    # Request errors are raised (and never cached) so the posting is reported as failed
+    return dict(posting_text(fetch_webpage(url)), url=url)
+
+
+def tailor_prompt(profile: dict, posting: dict) -> str:
+    return "\n".join([
+        "You tailor a candidate's application to one job posting, then judge it as the hiring manager.",
+        "1. Extract the company, the job title and the key requirements and qualifications.",
+        "2. Rewrite the CV (markdown) to emphasise what the job needs: reorder skills and key points, "
+        "do NOT add any skill or information that is not in the profile, keep it honest.",
+        "3. Write the cover letter (plain text) for this job and company from the candidate's points.",
+        "4. As an experienced hiring manager, score from 0 to 100 how well suited the candidate is, "
+        "given the tailored CV and cover letter, with a one-sentence rationale.",
+        "Answer with JSON only:",
+        '{"company": "", "title": "", "requirements": [""], "cv": "", "cover_letter": "", '
+        '"score": 0, "rationale": ""}',
+        "", "Candidate profile:", json.dumps(profile, ensure_ascii=False),
+        "", f"Job posting ({posting['url']}) - {posting['title']}:", posting["text"]])
+
+
+def _fake_tailoring(profile: dict, posting: dict) -> str:
+    requirements = [line for line in posting["text"].splitlines()[:5]]
+    overlap = sum(1 for skill in profile["skills"] if skill.lower() in posting["text"].lower())
+    return json.dumps({"company": "", "title": posting["title"], "requirements": requirements,
+                       "cv": f"# {profile['name']}\n\n{profile['headline']}",
+                       "cover_letter": f"Dear hiring team,\n\n{profile['headline']}",
+                       "score": min(100, 40 + 5 * overlap), "rationale": f"{overlap} matching skills"})
+
+
+def _score(value):
+    try:
+        return max(0, min(100, int(float(value))))
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value) -> str:
+    # The model may answer a field with a number, list or object
+    return str(value or "")
+
+
+def tailor(profile: dict, posting: dict) -> dict:
+    """One model call: requirements, tailored CV and cover letter, recruiter score."""
+    data = _ask(tailor_prompt(profile, posting), _fake_tailoring(profile, posting))
+    return {"url": posting["url"], "company": _text(data.get("company")),
+            "title": _text(data.get("title") or posting["title"]),
+            "requirements": data.get("requirements") or [], "cv": _text(data.get("cv")),
+            "cover_letter": _text(data.get("cover_letter")), "score": _score(data.get("score")),
+            "rationale": _text(data.get("rationale"))}
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "posting"
+
+
+def _write(out_dir: str, rank: int, result: dict) -> str:
+    name = _slug(_text(result.get("company")) + " " + _text(result.get("title")))
+    path = os.path.join(out_dir, f"{rank:02d}-{name}")
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "cv.md"), "w", encoding="utf-8") as f:
+        f.write(_text(result.get("cv")))
+    with open(os.path.join(path, "cover_letter.txt"), "w", encoding="utf-8") as f:
+        f.write(_text(result.get("cover_letter")))
+    return path
+
+
+def run(cv_path: str, cover_letter_path: str, urls: list, concurrency: int = None) -> tuple:
+    """(results ranked by score, {url: error}) for every posting in `urls`."""
+    profile = load_profile(cv_path, cover_letter_path)
+    results, failed = [], {}
+    # Fetching and the model call are chained per posting; model calls are
+    # throttled by app.llm.rate_limiter, which every thread here shares
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or settings.APPLICATION_CONCURRENCY)) as pool:
+        futures = {pool.submit(lambda url: tailor(profile, fetch_posting(url)), url): url
+                   for url in dict.fromkeys(urls)}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failed[futures[future]] = str(e)
+    results.sort(key=lambda result: -1 if result["score"] is None else result["score"], reverse=True)
+    return results, failed
+
+
+def table(results: list) -> str:
+    rows = [("#", "score", "company", "title", "url")]
+    rows += [(str(rank), "-" if result["score"] is None else str(result["score"]),
+              result["company"][:30], result["title"][:50], result["url"])
+             for rank, result in enumerate(results, 1)]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]) - 1)]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) + "  " + row[-1]
+                     for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls", nargs="*", help="job posting URLs")
+    parser.add_argument("--urls-file", help="file with one posting URL per line")
+    parser.add_argument("--cv", required=True, help="CV (PDF, markdown or text)")
+    parser.add_argument("--cover-letter", required=True, help="cover letter (PDF, markdown or text)")
+    parser.add_argument("--out", default="out/applications")
+    parser.add_argument("--concurrency", type=int, default=settings.APPLICATION_CONCURRENCY,
+                        help="postings processed at once")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file, encoding="utf-8") as f:
+            urls += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not urls:
+        parser.error("no job posting URLs")
+
+    results, failed = run(args.cv, args.cover_letter, urls, args.concurrency)
+    os.makedirs(args.out, exist_ok=True)
+    for rank, result in enumerate(results, 1):
+        result["path"] = _write(args.out, rank, result)
+    with open(os.path.join(args.out, "ranking.json"), "w", encoding="utf-8") as f:
+        json.dump({"results": results, "failed": failed}, f, indent=2)
+    print(table(results))
+    for url, error in failed.items():
+        print(f"[failed] {url}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Structured business profiles, crawled once and shared by every pipeline.
+
+Replaces the `business_crawler` crew of crap/main.py and the hand-pasted
+`businessDescription` of crap/interlinkingAgent.py. A storefront is crawled
+(home page plus a few same-site pages, through the tool cache) and condensed
+by one model call into a compact profile: what the business offers, who it
+sells to, its tone and its product categories.
+
+Profiles are versioned in the shared state database. A profile older than
+BUSINESS_PROFILE_TTL is refreshed on next use: the site is crawled again, and
+a new version is extracted only if the pages changed. Pipelines take just the
+fields they need with `BusinessProfile.prompt(...)`.
+
+    python -m app.business https://www.example-store.com [--refresh] [--history]
+"""
+import argparse
+import hashlib
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from urllib.parse import urljoin, urlparse
+
+from app import db, seo, settings
+from app.tools import fetch_webpage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS business_profiles (
+    url TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    profile TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (url, version)
+);
+"""
+
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+LINK_RE = re.compile(r"""<a\b[^>]*href=["']([^"'#]+)["']""", re.IGNORECASE)
+# Same-site pages worth reading besides the home page
+USEFUL_LINK_RE = re.compile(r"about|story|who-we-are|categor|collections?|shop|products?", re.IGNORECASE)
+
+MODEL = "gpt-4-turbo"
+# Bump when the extraction prompt changes so profiles are extracted again
+EXTRACTOR_VERSION = 1
+MIN_LINE_WORDS = 3
+LIST_FIELDS = ("offerings", "categories", "selling_points")
+
+
+@dataclass
+class BusinessProfile:
+    url: str
+    name: str = ""
+    summary: str = ""
+    offerings: list = field(default_factory=list)
+    audience: str = ""
+    tone: str = ""
+    categories: list = field(default_factory=list)
+    selling_points: list = field(default_factory=list)
+    version: int = 0
+    created_at: float = 0.0
+    checked_at: float = 0.0
+
+    def prompt(self, *fields) -> str:
+        """The given fields as short labelled lines, empty ones left out."""
+        lines = []
+        for name in fields:
+            value = getattr(self, name)
+            if isinstance(value, list):
+                value = ", ".join(value)
+            if value:
+                lines.append(f"{name.replace('_', ' ').capitalize()}: {value}")
+        return "\n".join(lines)
+
+    def ref(self) -> str:
+        """Identifies the profile version a piece of content was written with."""
+        return f"{self.url}@v{self.version}"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def for_business(profile, *fields) -> str:
+    """Prompt suffix with the given profile fields ("" without a profile)."""
+    text = profile.prompt(*fields) if profile is not None else ""
+    return f"\n\nThe business this is for:\n{text}" if text else ""
+
+
+def normalize_url(url: str) -> str:
+    parsed = urlparse(url if "://" in url else "https://" + url)
+    return f"{parsed.scheme}://{parsed.netloc.lower()}{parsed.path.rstrip('/')}"
+
+
+def page_text(page: str) -> str:
+    """Visible text of a page without navigation-sized fragments or repeated lines."""
+    lines, seen = [], set()
+    for line in seo.plain_text(page).splitlines():
+        line = " ".join(line.split())
+        if len(line.split()) >= MIN_LINE_WORDS and line not in seen:
+            seen.add(line)
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def site_links(page: str, url: str, limit: int) -> list:
+    host = urlparse(url).netloc
+    links = []
+    for href in LINK_RE.findall(page):
+        link = urljoin(url + "/", href)
+        if urlparse(link).netloc == host and USEFUL_LINK_RE.search(urlparse(link).path) and link not in links:
+            links.append(link)
+    return links[:limit]
+
+
+def crawl(url: str, pages: int = None) -> str:
+    """Text of the home page and up to `pages - 1` same-site pages, fetched concurrently."""
+    pages = settings.BUSINESS_CRAWL_PAGES if pages is None else pages
+    home = fetch_webpage(url)
+    texts = [page_text(home)]
+    links = site_links(home, url, max(0, pages - 1))
+    if links:
+        with ThreadPoolExecutor(max_workers=len(links)) as pool:
+            for link, page in zip(links, pool.map(_fetch_quietly, links)):
+                if page:
+                    texts.append(f"[{link}]\n{page_text(page)}")
+    return "\n\n".join(texts)[:settings.BUSINESS_CRAWL_CHARS]
+
+
+def _fetch_quietly(url: str) -> str:
+    # Extra pages are optional; one that fails is left out
+    try:
+        return fetch_webpage(url)
+    except Exception:
+        return ""
+
+
+def extract_prompt(url: str, text: str) -> str:
+    return "\n".join([
+        f"From the pages of the online store {url} below, describe the business as JSON only:",
+        '{"name": "", "summary": "<one or two sentences>", "offerings": ["<product or service>"], '
+        '"audience": "<who buys>", "tone": "<brand voice in a few words>", '
+        '"categories": ["<product category>"], "selling_points": ["<unique selling proposition>"]}',
+        "Use only what the pages say. Keep lists under 12 short items.",
+        "", text])
+
+
+def _fake_extraction(url: str, text: str) -> str:
+    lines = text.splitlines()
+    return json.dumps({"name": urlparse(url).netloc, "summary": lines[0][:200] if lines else "",
+                       "offerings": [], "audience": "online shoppers", "tone": "friendly",
+                       "categories": [], "selling_points": []})
+
+
+def extract(url: str, text: str) -> dict:
+    """One model call from crawled text to profile fields."""
+    from app.llm import get_llm
+
+    llm = get_llm(model_name=MODEL, temperature=0.0, fake_response=_fake_extraction(url, text))
+    match = JSON_OBJECT_RE.search(llm.invoke(extract_prompt(url, text)).content or "")
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        data = {}
+    fields = {}
+    for name in ("name", "summary", "audience", "tone") + LIST_FIELDS:
+        value = data.get(name) if isinstance(data, dict) else None
+        if name in LIST_FIELDS:
+            fields[name] = [str(item) for item in value] if isinstance(value, list) else []
+        else:
+            fields[name] = str(value) if value else ""
+    return fields
+
+
+class ProfileStore:
+    """Versions of every crawled business profile, shared by all workers."""
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.STATE_DB
+        db.ensure_schema(self.path, SCHEMA)
+
+    @staticmethod
+    def _row_to_profile(row) -> BusinessProfile:
+        return BusinessProfile(url=row["url"], version=row["version"], created_at=row["created_at"],
+                               checked_at=row["checked_at"], **json.loads(row["profile"]))
+
+    def latest(self, url: str):
+        """(profile, source hash) of the newest version, or None."""
+        row = db.connect(self.path).execute(
+            "SELECT * FROM business_profiles WHERE url = ? ORDER BY version DESC LIMIT 1",
+            (url,)).fetchone()
+        return (self._row_to_profile(row), row["source_hash"]) if row else None
+
+    def history(self, url: str) -> list:
+        rows = db.connect(self.path).execute(
+            "SELECT * FROM business_profiles WHERE url = ? ORDER BY version DESC", (url,)).fetchall()
+        return [self._row_to_profile(row) for row in rows]
+
+    def save(self, url: str, fields: dict, source_hash: str) -> BusinessProfile:
+        now = time.time()
+        with db.transaction(self.path) as conn:
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM business_profiles WHERE url = ?",
+                (url,)).fetchone()[0]
+            conn.execute(
+                "INSERT INTO business_profiles (url, version, profile, source_hash, created_at, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (url, version, json.dumps(fields), source_hash, now, now))
+        return BusinessProfile(url=url, version=version, created_at=now, checked_at=now, **fields)
+
+    def touch(self, profile: BusinessProfile):
+        """Mark an unchanged profile as checked now."""
+        profile.checked_at = time.time()
+        db.connect(self.path).execute(
+            "UPDATE business_profiles SET checked_at = ? WHERE url = ? AND version = ?",
+            (profile.checked_at, profile.url, profile.version))
+
+
+def get_profile(url: str, refresh: bool = False, store: ProfileStore = None) -> BusinessProfile:
+    """The current profile of the store at `url`, crawling only when it is stale."""
+    store = store or ProfileStore()
+    url = normalize_url(url)
+    current = store.latest(url)
+    if current is not None and not refresh and \
+            time.time() - current[0].checked_at < settings.BUSINESS_PROFILE_TTL:
+        return current[0]
+    text = crawl(url)
+    source_hash = hashlib.sha256(f"{EXTRACTOR_VERSION}:{MODEL}:{text}".encode("utf-8")).hexdigest()
+    if current is not None and current[1] == source_hash:
+        # Same pages: no model call, no new version
+        store.touch(current[0])
+        return current[0]
+    return store.save(url, extract(url, text), source_hash)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--refresh", action="store_true", help="crawl again even if the profile is fresh")
+    parser.add_argument("--history", action="store_true", help="list every stored version")
+    args = parser.parse_args()
+
+    if args.history:
+        profiles = ProfileStore().history(normalize_url(args.url))
+        print(json.dumps([profile.to_dict() for profile in profiles], indent=2))
+        return
+    print(json.dumps(get_profile(args.url, refresh=args.refresh).to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import time
+
+from app import db, settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+def make_key(*parts) -> str:
+    """Stable hash for any JSON-serialisable key parts."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SharedCache:
+    """Key/value cache in the shared SQLite database, visible to every worker."""
+
+    def __init__(self, namespace: str, ttl: float = None, path: str = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.path = path or settings.STATE_DB
+        db.ensure_schema(self.path, SCHEMA)
+
+    def get(self, key: str, default=None):
+        row = db.connect(self.path).execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)).fetchone()
+        if row is None:
+            return default
+        if row["expires_at"] is not None and row["expires_at"] < time.time():
+            self.delete(key)
+            return default
+        return json.loads(row["value"])
+
+    def set(self, key: str, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        db.connect(self.path).execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), expires_at))
+
+    def delete(self, key: str):
+        db.connect(self.path).execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def clear(self):
+        db.connect(self.path).execute(
+            "DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def purge_expired(self):
+        db.connect(self.path).execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, time.time()))
@@ -0,0 +1,417 @@
+"""Category descriptions for a whole store taxonomy.
+
+    python -m app.categories tree.json --out out/categories --concurrency 4
+
+The tree is JSON (`{"business_description": ..., "categories": [...]}` where
+each category has a `name` and `children` with `name`/`url`, nested to any
+depth) or CSV with `parent,child,url` columns plus `--business`. Instead of a
+description, the tree's `business_url` or `--business-url` points at the
+store, whose cached profile (app.business) describes the business. Every
+category that has children gets one HTML file. Files are written as soon as
+each category finishes, and categories whose file already exists are skipped,
+so an interrupted run picks up where it stopped.
+
+With `--refresh` every category is run again, incrementally: each step's
+output is stored under a hash of its exact inputs (prompt, agent, upstream
+outputs), so after editing one child URL or the business description only
+the steps that consume the change are recomputed. Categories where nothing
+changed cost no model calls, and files whose HTML came out the same are left
+alone.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app import logs, seo, settings
+from app.business import get_profile
+from app.content_store import ContentStore
+from app.dedupe import DuplicateIndex
+from app.interlinks import InterlinkIndex
+from app.jobs import JobQueue
+from app.pipeline import Pipeline, Step
+
+log = logging.getLogger(__name__)
+
+
+class CategoryAgents:
+    def __init__(self):
+        from app.llm import get_llm
+        self.model = get_llm(model_name="gpt-4-turbo", temperature=0.8)
+
+    def _agent(self, role, goal, backstory):
+        from crewai import Agent
+        return Agent(
+            role=role,
+            goal=goal,
+            backstory=backstory,
+            llm=self.model,
+            max_iter=15,
+            max_execution_time=60,
+            verbose=False,
+            allow_delegation=False,
+            cache=True
+        )
+
+    def content_creator_agent(self):
+        return self._agent(
+            'E-commerce Content Creator',
+            'Write comprehensive text for the category',
+            """You are responsible for receiving information about the website
+    and the category we are writing the description for. You then write a comprehensive
+    and engaging text for the category.""")
+
+    def link_integration_agent(self):
+        return self._agent(
+            'Link Integration Specialist',
+            'Create unique interlinking sentences',
+            """You are responsible for receiving the category links and text,
+    creating four unique interlinking sentences. Each sentence must have one
+    semantically related category name linked to its respective URL.
+    You must avoid redundancy and overlap.""")
+
+    def content_integration_agent(self):
+        return self._agent(
+            'Content Integration Manager',
+            'Combine text and interlinking sentences into a cohesive description',
+            """You are responsible for receiving the category text from
+    the E-commerce Content Creator and the interlinking sentences from the
+    Link Integration Specialist. You need to combine them into a cohesive
+    and engaging category description.""")
+
+    def qa_agent(self):
+        return self._agent(
+            'QA Specialist',
+            'Ensure the final description meets all the requirements',
+            """You are responsible for reviewing the final category description
+    and ensuring it meets all the requirements. You must check for accuracy,
+    coherence, and proper integration of links.""")
+
+    def website_integrator_agent(self):
+        return self._agent(
+            'Website Integrator',
+            'Integrate the category description into the website',
+            """You are responsible for receiving the category description
+    from the Content Integration Manager and integrating it into the website
+    using HTML. You must ensure the text is properly formatted and optimized for SEO.""")
+
+
+class CategoryService:
+    """Runs the five-step category description crew for one parent category."""
+
+    def describe(self, parent: str, children: list, business_description: str,
+                 job_id: str = None, related: list = None, hint: str = "",
+                 pipeline: Pipeline = None) -> str:
+        """`related` are extra categories picked by the interlink index; the
+        link step only writes sentences for the links it is given. `hint` is
+        added to the writing step (used to steer away from duplicates). Pass
+        a `pipeline` to read its timings and token usage afterwards."""
+        agents = CategoryAgents()
+        children_json = json.dumps(children, indent=2)
+        links_json = json.dumps(children + (related or []), indent=2)
+        related_note = ""
+        if related:
+            related_note = f"""
+    Then add one sentence for each of these related categories, linking its exact name to its URL:
+    {json.dumps(related, indent=2)}
+    Do not link any category that is not listed above.
+    """
+        steps = [
+            Step(
+                "text",
+                description=f'Write a comprehensive text for the parent category {parent}{hint}',
+                expected_output='A well-written category text',
+                agent=agents.content_creator_agent(),
+                context=[],
+            ),
+            Step(
+                "interlinks",
+                description=f"""
+    Create a concise paragraph (3-4 sentences) that mentions all the {parent} categories from the provided JSON data.
+    Include natural-sounding interlinks using the exact category names as anchor text and their corresponding URLs.
+    Use only the information provided in the JSON, without adding any external details.
+
+    JSON data:
+    {children_json}
+    {related_note}""",
+                expected_output=f'Concise paragraph mentioning all {parent} categories with interlinked URLs from the JSON data',
+                agent=agents.link_integration_agent(),
+                context=[],
+            ),
+            Step(
+                "integrate",
+                description=f'Combine the parent category text and Small unique paragraph about product categories with interlinked URLs into a cohesive description for the following business: {business_description}',
+                expected_output='A perfect category description',
+                agent=agents.content_integration_agent(),
+                context=["text", "interlinks"],
+            ),
+            Step(
+                "qa",
+                description=f"""
+    Review the given text and remove any content that is not directly related to the specified categories.
+
+    Follow these steps:
+    1. Remove any sentences or phrases that do not directly relate to the categories.
+
+    Input:
+    - Parent category: {parent}
+    - List of child categories: {links_json}
+    """,
+                expected_output='Refined text containing only relevant information about the business and categories.',
+                agent=agents.qa_agent(),
+                # QA only runs when the local checks fail, and only on those findings
+                review=lambda outputs: self.review_description(
+                    outputs["integrate"], parent, children + (related or [])),
+            ),
+            Step(
+                "html",
+                description=f"""
+    Integrate the provided category description into the website using HTML. Follow these guidelines:
+    1. Wrap the entire content in a <div> with a class of "category-description".
+    2. Use appropriate HTML tags for text formatting (e.g., <p> for paragraphs).
+    3. Create hyperlinks (<a> tags) ONLY for the exact category names mentioned in the text.
+    4. Use the corresponding URLs from the original JSON data for each hyperlink.
+    5. Do NOT add any buttons or additional navigation elements.
+    6. Ensure the HTML is semantic and accessibility-friendly.
+
+    JSON data:
+    {links_json}""",
+                expected_output='HTML code for the category description with proper interlinking',
+                agent=agents.website_integrator_agent(),
+            ),
+        ]
+        return (pipeline or Pipeline(job_id=job_id)).run(steps)["html"]
+
+    def review_description(self, text: str, parent: str, links: list) -> str:
+        return seo.analyze(text, keywords=[parent],
+                           expected_links=[link["url"] for link in links]).to_prompt()
+
+
+def slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "category"
+
+
+def _flatten(nodes, path=()):
+    """Yield (path, name, children) for every category that has children."""
+    for node in nodes:
+        children = node.get("children") or []
+        if children:
+            links = [{"name": child["name"], "url": child["url"]}
+                     for child in children if child.get("url")]
+            yield path + (node["name"],), node["name"], links
+            yield from _flatten(children, path + (node["name"],))
+
+
+def _read_json_tree(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"categories": data}
+    return data
+
+
+def _read_csv_tree(path: str) -> dict:
+    parents = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            parents.setdefault(row["parent"], []).append(
+                {"name": row["child"], "url": row["url"]})
+    return {"categories": [{"name": parent, "children": children}
+                           for parent, children in parents.items()]}
+
+
+def read_tree(path: str) -> dict:
+    return _read_csv_tree(path) if path.endswith(".csv") else _read_json_tree(path)
+
+
+def category_key(path) -> str:
+    return "/".join(path)
+
+
+def _walk(nodes, path=()):
+    for node in nodes:
+        yield path + (node["name"],), node
+        yield from _walk(node.get("children") or [], path + (node["name"],))
+
+
+def build_interlink_index(tree) -> InterlinkIndex:
+    """Index every category of a tree (path or already-loaded dict)."""
+    data = read_tree(tree) if isinstance(tree, str) else tree
+    index = InterlinkIndex()
+    for path, node in _walk(data["categories"]):
+        # Without a description, a category is described by its children
+        description = node.get("description") or " ".join(
+            child["name"] for child in node.get("children") or [])
+        index.upsert(category_key(path), node["name"], node.get("url"), description)
+    index.rebuild()
+    return index
+
+
+def load_tree(path: str, business_description: str = None, business_url: str = None):
+    """Return (business_description, [(path, parent, children), ...], index)."""
+    data = read_tree(path)
+    business_url = business_url or data.get("business_url")
+    if not business_description and business_url:
+        # Only what the integration step needs, not the whole crawl
+        business_description = get_profile(business_url).prompt(
+            "name", "summary", "offerings", "tone")
+    business_description = business_description or data.get("business_description")
+    return business_description, list(_flatten(data["categories"])), build_interlink_index(data)
+
+
+class BulkCategoryRunner:
+    """Describes many categories concurrently and writes each one to disk."""
+
+    def __init__(self, out_dir: str, concurrency: int = 4, service: CategoryService = None,
+                 related_links: int = 0, refresh: bool = False):
+        self.out_dir = out_dir
+        self.concurrency = concurrency
+        self.related_links = related_links
+        self.refresh = refresh
+        self.service = service or CategoryService()
+        self.jobs = JobQueue()
+        self.duplicates = DuplicateIndex()
+        self.store = ContentStore()
+
+    def output_path(self, path) -> str:
+        return os.path.join(self.out_dir, "--".join(slugify(part) for part in path) + ".html")
+
+    def _write(self, target: str, html: str):
+        # Write then rename, so a crash never leaves a half file that would
+        # be mistaken for a finished category on the next run.
+        tmp = target + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp, target)
+
+    def _related(self, index: InterlinkIndex, path, children) -> list:
+        if not index or not self.related_links:
+            return []
+        # Children are linked anyway; ancestors are not worth a sentence
+        exclude = {category_key(path + (child["name"],)) for child in children}
+        exclude.update(category_key(path[:i]) for i in range(1, len(path)))
+        return [{"name": item["name"], "url": item["url"]}
+                for item in index.related(category_key(path), self.related_links + 2, exclude)
+                if item["url"]][:self.related_links]
+
+    def _describe(self, path, parent, children, business_description, related):
+        target = self.output_path(path)
+        started = time.perf_counter()
+        # An interrupted category resumes from the step cache of the incremental
+        # pipeline, so only steps whose inputs changed since are redone
+        job_id = "category:" + os.path.basename(target)
+        pipeline = Pipeline(job_id=job_id, queue=self.jobs, incremental=True)
+        html = self.service.describe(parent, children, business_description, job_id=job_id,
+                                     related=related, pipeline=pipeline)
+        duplicates = self.duplicates.find_similar(html, exclude=(job_id,))
+        if duplicates and settings.DEDUPE_ACTION == "regenerate":
+            hint = (f". Another category page ({duplicates[0]['doc_id']}) reads almost the same; "
+                    "use a clearly different angle and wording")
+            html = self.service.describe(parent, children, business_description, job_id=job_id,
+                                         related=related, hint=hint, pipeline=pipeline)
+            duplicates = self.duplicates.find_similar(html, exclude=(job_id,))
+        steps = {"reused": len(pipeline.reused()), "run": len(pipeline.stats) - len(pipeline.reused())}
+        if self._unchanged(target, html):
+            return target, time.perf_counter() - started, duplicates, steps, False
+        self.duplicates.add(job_id, html, kind="category")
+        self.store.add("category", parent, html, category=category_key(path),
+                       inputs={"children": children, "related": related,
+                               "business_description": business_description},
+                       model=pipeline.model(), usage=pipeline.usage(),
+                       duration_s=round(time.perf_counter() - started, 3),
+                       timings=pipeline.timings(), job_id=job_id)
+        self._write(target, html)
+        return target, time.perf_counter() - started, duplicates, steps, True
+
+    @staticmethod
+    def _unchanged(target: str, html: str) -> bool:
+        try:
+            with open(target, encoding="utf-8") as f:
+                return f.read() == html
+        except FileNotFoundError:
+            return False
+
+    def run(self, items, business_description: str, index: InterlinkIndex = None) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        summary = {"done": [], "unchanged": [], "skipped": [], "failed": {}, "duplicates": {},
+                   "steps": {"reused": 0, "run": 0}}
+        pending = []
+        for path, parent, children in items:
+            if not self.refresh and os.path.exists(self.output_path(path)):
+                summary["skipped"].append(self.output_path(path))
+            else:
+                pending.append((path, parent, children))
+
+        # Model calls are throttled by app.llm.rate_limiter, which every
+        # thread here shares.
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._describe, path, parent, children, business_description,
+                                   self._related(index, path, children)): parent
+                       for path, parent, children in pending}
+            for future in as_completed(futures):
+                parent = futures[future]
+                try:
+                    target, seconds, duplicates, steps, written = future.result()
+                except Exception as e:
+                    summary["failed"][parent] = str(e)
+                    log.warning("category failed", extra={"category": parent, "error": str(e)})
+                else:
+                    for key in steps:
+                        summary["steps"][key] += steps[key]
+                    if not written:
+                        summary["unchanged"].append(target)
+                        continue
+                    summary["done"].append(target)
+                    log.info("category done", extra={"category": parent, "path": target,
+                                                     "seconds": round(seconds, 1),
+                                                     "steps_run": steps["run"],
+                                                     "steps_reused": steps["reused"]})
+                    if duplicates:
+                        # Still too close after a rewrite (or DEDUPE_ACTION=flag)
+                        summary["duplicates"][target] = duplicates
+                        log.warning("category duplicate", extra={
+                            "path": target, "similar_to": duplicates[0]["doc_id"],
+                            "similarity": round(duplicates[0]["similarity"], 3)})
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tree", help="category tree (.json or .csv)")
+    parser.add_argument("--business", help="business description text, or a path to a file with it")
+    parser.add_argument("--business-url", help="store URL to describe the business from its profile")
+    parser.add_argument("--refresh", action="store_true",
+                        help="rerun existing categories, recomputing only steps whose inputs changed")
+    parser.add_argument("--out", default="out/categories")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--related-links", type=int, default=0,
+                        help="also link this many related categories from elsewhere in the tree")
+    args = parser.parse_args()
+
+    business = args.business
+    if business and os.path.isfile(business):
+        with open(business, encoding="utf-8") as f:
+            business = f.read().strip()
+    business, items, index = load_tree(args.tree, business, args.business_url)
+    if not business:
+        parser.error("no business description: pass --business or --business-url, or set it in the tree")
+
+    logs.setup()
+    runner = BulkCategoryRunner(args.out, args.concurrency, related_links=args.related_links,
+                                refresh=args.refresh)
+    summary = runner.run(items, business, index)
+    print(f"{len(summary['done'])} written, {len(summary['unchanged'])} unchanged, "
+          f"{len(summary['skipped'])} skipped, "
+          f"{len(summary['failed'])} failed, {len(summary['duplicates'])} flagged as duplicates; "
+          f"{summary['steps']['run']} steps run, {summary['steps']['reused']} reused")
+
+
+if __name__ == "__main__":
+    # Log as app.categories
+    from app.categories import main
+    main()
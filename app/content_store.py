@@ -0,0 +1,169 @@
+"""Persistent store of generated content.
+
+Every post is kept with the inputs that produced it, so a repeated request is
+served from here instead of running the crew again, and old content can be
+listed and searched.
+"""
+import json
+import re
+import time
+import uuid
+import zlib
+
+from app import db, settings
+from app.seo import plain_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    headline TEXT NOT NULL,
+    category TEXT,
+    inputs TEXT NOT NULL,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    duration_s REAL,
+    timings TEXT,
+    job_id TEXT,
+    created_at REAL NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_headline ON posts (kind, headline, created_at);
+CREATE INDEX IF NOT EXISTS posts_category ON posts (category, created_at);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (created_at);
+CREATE INDEX IF NOT EXISTS posts_job ON posts (job_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(headline, body, content='');
+"""
+
+# Everything but the body, for listings
+SUMMARY_COLUMNS = ("id, kind, headline, category, model, prompt_tokens, completion_tokens, "
+                   "total_tokens, duration_s, job_id, created_at")
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _snippet(text: str, query: str, width: int = 160) -> str:
+    # The FTS index is contentless (bodies live compressed in posts), so
+    # snippets are cut here instead of with FTS5's snippet()
+    text = " ".join(text.split())
+    terms = [term for term in re.findall(r"\w+", query) if term.upper() not in ("AND", "OR", "NOT")]
+    match = re.search("|".join(re.escape(term) for term in terms), text, re.IGNORECASE) if terms else None
+    start = max(0, match.start() - width // 3) if match else 0
+    return ("..." if start else "") + text[start:start + width] + ("..." if start + width < len(text) else "")
+
+
+def _row_to_post(row, with_body: bool = False) -> dict:
+    post = dict(row)
+    if "inputs" in post:
+        post["inputs"] = json.loads(post["inputs"])
+    if "timings" in post:
+        post["timings"] = json.loads(post["timings"]) if post["timings"] else None
+    if "body" in post:
+        body = post.pop("body")
+        if with_body:
+            post["body"] = _decompress(body)
+    post.pop("rowid", None)
+    return post
+
+
+class ContentStore:
+    """Every generated post, with its inputs, model, tokens and timings.
+
+    Bodies are stored zlib-compressed; a contentless FTS5 index over the
+    headline and visible text serves full-text search.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.CONTENT_DB
+        db.ensure_schema(self.path, SCHEMA)
+
+    def add(self, kind: str, headline: str, body: str, inputs: dict = None, category: str = None,
+            model: str = None, usage: dict = None, duration_s: float = None,
+            timings: dict = None, job_id: str = None) -> str:
+        usage = usage or {}
+        post_id = uuid.uuid4().hex
+        with db.transaction(self.path) as conn:
+            cur = conn.execute(
+                "INSERT INTO posts (id, kind, headline, category, inputs, model, prompt_tokens, "
+                "completion_tokens, total_tokens, duration_s, timings, job_id, created_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (post_id, kind, headline, category, json.dumps(inputs or {}), model,
+                 usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                 usage.get("total_tokens"), duration_s,
+                 json.dumps(timings) if timings else None, job_id, time.time(),
+                 _compress(body)))
+            conn.execute("INSERT INTO posts_fts (rowid, headline, body) VALUES (?, ?, ?)",
+                         (cur.lastrowid, headline, plain_text(body)))
+        return post_id
+
+    def get(self, post_id: str):
+        row = db.connect(self.path).execute(
+            "SELECT * FROM posts WHERE id = ?", (post_id,)).fetchone()
+        return _row_to_post(row, with_body=True) if row else None
+
+    def latest(self, kind: str, headline: str, max_age: float = None):
+        """Most recent post for a headline (with body), or None."""
+        sql = "SELECT * FROM posts WHERE kind = ? AND headline = ?"
+        params = [kind, headline]
+        if max_age:
+            sql += " AND created_at >= ?"
+            params.append(time.time() - max_age)
+        row = db.connect(self.path).execute(
+            sql + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return _row_to_post(row, with_body=True) if row else None
+
+    def list(self, kind: str = None, headline: str = None, category: str = None,
+             since: float = None, until: float = None, job_id: str = None,
+             limit: int = 50, offset: int = 0) -> list:
+        clauses, params = [], []
+        for column, value in (("kind", kind), ("headline", headline), ("category", category),
+                              ("job_id", job_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = db.connect(self.path).execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM posts {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]).fetchall()
+        return [_row_to_post(row) for row in rows]
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Full-text search (FTS5 syntax); best matches first, with a snippet."""
+        rows = db.connect(self.path).execute(
+            "SELECT p.* FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid "
+            "WHERE posts_fts MATCH ? ORDER BY bm25(posts_fts) LIMIT ?",
+            (query, limit)).fetchall()
+        results = []
+        for row in rows:
+            post = _row_to_post(row, with_body=True)
+            post["snippet"] = _snippet(plain_text(post.pop("body")), query)
+            results.append(post)
+        return results
+
+    def delete(self, post_id: str) -> bool:
+        with db.transaction(self.path) as conn:
+            row = conn.execute("SELECT rowid, headline, body FROM posts WHERE id = ?",
+                               (post_id,)).fetchone()
+            if row is None:
+                return False
+            # Contentless FTS needs the original text to remove a row
+            conn.execute(
+                "INSERT INTO posts_fts (posts_fts, rowid, headline, body) VALUES ('delete', ?, ?, ?)",
+                (row["rowid"], row["headline"], plain_text(_decompress(row["body"]))))
+            conn.execute("DELETE FROM posts WHERE rowid = ?", (row["rowid"],))
+        return True
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app import settings
+
+_local = threading.local()
+_schemas = set()
+_schema_lock = threading.Lock()
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """Return this thread's connection to `path`, opened in WAL mode."""
+    path = path or settings.STATE_DB
+    # Connections must never cross a fork (gunicorn workers, worker pool)
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.conns = {}
+    conn = _local.conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conns[path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(path: str = None):
+    """Run a block inside a write transaction (BEGIN IMMEDIATE)."""
+    conn = connect(path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def ensure_schema(path: str, ddl: str):
+    """Create tables once per process for the given database file."""
+    path = path or settings.STATE_DB
+    key = (os.getpid(), path, ddl)
+    if key in _schemas:
+        return
+    with _schema_lock:
+        if key not in _schemas:
+            connect(path).executescript(ddl)
+            _schemas.add(key)
@@ -0,0 +1,179 @@
+"""Hedged execution of slow pipeline steps.
+
+A hedged step starts a second attempt once the first has run longer than
+the step's recent latency quantile, keeps whichever attempt passes
+validation first and cancels the other. The tokens spent by the discarded
+attempt are recorded per job.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app import db, settings
+from app.llm import Attempt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS step_latency (
+    step TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS step_latency_step ON step_latency (step, created_at);
+CREATE TABLE IF NOT EXISTS hedges (
+    job_id TEXT,
+    step TEXT NOT NULL,
+    after_s REAL NOT NULL,
+    winner TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    wasted_prompt_tokens INTEGER NOT NULL,
+    wasted_completion_tokens INTEGER NOT NULL,
+    wasted_total_tokens INTEGER NOT NULL,
+    wasted_calls INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+PRIMARY = "primary"
+HEDGE = "hedge"
+
+
+class HedgeLog:
+    """Latency samples per step and the cost of every hedge, shared by all workers."""
+
+    def __init__(self, path: str = None, window: int = 200, refresh: float = 60.0):
+        self.path = path or settings.STATE_DB
+        self.window = window
+        self.refresh = refresh
+        self._thresholds = {}
+        self._lock = threading.Lock()
+        db.ensure_schema(self.path, SCHEMA)
+
+    def record_latency(self, step: str, seconds: float):
+        db.connect(self.path).execute(
+            "INSERT INTO step_latency (step, seconds, created_at) VALUES (?, ?, ?)",
+            (step, seconds, time.time()))
+
+    def threshold(self, step: str, quantile: float = None, default: float = None) -> float:
+        """Seconds after which `step` gets a hedge: its recent latency quantile."""
+        quantile = settings.HEDGE_QUANTILE if quantile is None else quantile
+        default = settings.HEDGE_AFTER if default is None else default
+        with self._lock:
+            cached = self._thresholds.get((step, quantile))
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+        samples = sorted(row["seconds"] for row in db.connect(self.path).execute(
+            "SELECT seconds FROM step_latency WHERE step = ? ORDER BY created_at DESC LIMIT ?",
+            (step, self.window)))
+        if len(samples) < settings.HEDGE_MIN_SAMPLES:
+            value = default
+        else:
+            value = samples[min(len(samples) - 1, int(quantile * len(samples)))]
+        with self._lock:
+            self._thresholds[(step, quantile)] = (time.monotonic() + self.refresh, value)
+        return value
+
+    def record(self, job_id: str, step: str, after: float, winner: str, seconds: float,
+               wasted: Attempt):
+        db.connect(self.path).execute(
+            "INSERT INTO hedges (job_id, step, after_s, winner, seconds, wasted_prompt_tokens, "
+            "wasted_completion_tokens, wasted_total_tokens, wasted_calls, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, step, after, winner, seconds, wasted.usage["prompt_tokens"],
+             wasted.usage["completion_tokens"], wasted.usage["total_tokens"], wasted.calls,
+             time.time()))
+
+    def summary(self, since: float = 0) -> dict:
+        rows = db.connect(self.path).execute(
+            "SELECT step, winner, COUNT(*) AS hedges, SUM(wasted_total_tokens) AS wasted_tokens, "
+            "SUM(wasted_calls) AS wasted_calls, AVG(seconds) AS avg_seconds FROM hedges "
+            "WHERE created_at >= ? GROUP BY step, winner", (since,)).fetchall()
+        summary = {}
+        for row in rows:
+            step = summary.setdefault(row["step"], {"hedges": 0, "wins": {}, "wasted_tokens": 0,
+                                                    "wasted_calls": 0})
+            step["hedges"] += row["hedges"]
+            step["wins"][row["winner"]] = row["hedges"]
+            step["wasted_tokens"] += row["wasted_tokens"] or 0
+            step["wasted_calls"] += row["wasted_calls"] or 0
+        for name in summary:
+            summary[name]["threshold_s"] = self.threshold(name)
+        return summary
+
+
+class Hedge:
+    """Hedging for one step.
+
+    `agent` runs the second attempt (e.g. the same role on a cheaper model).
+    `validate` gets an attempt's output and returns the problems found, or
+    nothing when it is acceptable; without it the first attempt to finish wins.
+    """
+
+    def __init__(self, agent, validate=None, after: float = None, log: HedgeLog = None):
+        self.agent = agent
+        self.validate = validate
+        self.after = after
+        self.log = log or HedgeLog()
+
+
+def race(step: str, launch, primary_agent, hedge: Hedge, job_id: str = None):
+    """Run `launch(agent)` on the primary agent and, if it is slow, on the hedge agent.
+
+    Returns (result, winner, after); `result` is whatever `launch` returns,
+    its first item being the output text.
+    """
+    after = hedge.after if hedge.after is not None else hedge.log.threshold(step)
+    attempts = {PRIMARY: Attempt(PRIMARY), HEDGE: Attempt(HEDGE)}
+    agents = {PRIMARY: primary_agent, HEDGE: hedge.agent}
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"hedge-{step}")
+    started = time.perf_counter()
+
+    def submit(label):
+        context = contextvars.copy_context()
+        future = pool.submit(context.run, launch, agents[label], attempts[label])
+        futures[future] = label
+        return future
+
+    def primary_done(future):
+        # Slow and cancelled runs count too, or the quantile would only
+        # ever see the fast ones
+        if future.exception() is None or attempts[PRIMARY].cancelled.is_set():
+            hedge.log.record_latency(step, time.perf_counter() - started)
+
+    futures = {}
+    submit(PRIMARY).add_done_callback(primary_done)
+    try:
+        done, _ = wait(futures, timeout=after)
+        if done:
+            return done.pop().result(), PRIMARY, after
+        submit(HEDGE)
+
+        winner = fallback = error = None
+        pending = set(futures)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                label = futures[future]
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                result = future.result()
+                if hedge.validate is None or not hedge.validate(result[0]):
+                    winner = winner or (label, result)
+                else:
+                    fallback = fallback or (label, result)
+        # Neither passed: take the one that finished first
+        winner = winner or fallback
+        if winner is None:
+            raise error
+
+        label, result = winner
+        loser = HEDGE if label == PRIMARY else PRIMARY
+        attempts[loser].cancel()
+        elapsed = time.perf_counter() - started
+        loser_future = next(future for future, name in futures.items() if name == loser)
+        loser_future.add_done_callback(lambda _: hedge.log.record(
+            job_id, step, after, label, elapsed, attempts[loser]))
+        return result, label, after
+    finally:
+        pool.shutdown(wait=False)
@@ -0,0 +1,214 @@
+"""Local similarity index over a site's categories.
+
+Picks the most related categories for interlinking without asking the LLM:
+TF-IDF vectors over category names and descriptions, cosine top-k through an
+inverted index, answers cached per category.
+
+    python -m app.interlinks tree.json "E-Bikes" -k 4
+"""
+import argparse
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or our that the "
+    "this to we with you your all more new".split())
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        # Cheap plural folding so "bikes" and "bike" match
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class InterlinkIndex:
+    """TF-IDF cosine index with incremental updates.
+
+    IDF weights are frozen at the last full rebuild so that adding, changing
+    or removing a category only re-weights that category and drops the
+    cached neighbours of categories that share a term with it. The index
+    rebuilds itself once the number of changes exceeds `rebuild_ratio` of
+    its size, which keeps the weights from drifting.
+    """
+
+    def __init__(self, name_weight: int = 3, rebuild_ratio: float = 0.2):
+        self.name_weight = name_weight
+        self.rebuild_ratio = rebuild_ratio
+        self.docs = {}
+        self._terms = {}
+        self._df = Counter()
+        self._idf = {}
+        self._vectors = {}
+        self._postings = defaultdict(dict)
+        self._neighbours = {}
+        self._changes = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, key):
+        return key in self.docs
+
+    def _doc_terms(self, doc: dict) -> Counter:
+        terms = Counter(tokenize(doc.get("description") or ""))
+        for token in tokenize(doc["name"]):
+            terms[token] += self.name_weight
+        return terms
+
+    def _idf_for(self, term: str, store: bool = True) -> float:
+        idf = self._idf.get(term)
+        if idf is None:
+            # Term unseen at the last rebuild: weight it from the live counts
+            idf = math.log((len(self.docs) + 1) / (self._df[term] + 1)) + 1
+            if store:
+                self._idf[term] = idf
+        return idf
+
+    def _vectorize(self, terms: Counter, store: bool = True) -> dict:
+        weights = {term: (1 + math.log(tf)) * self._idf_for(term, store)
+                   for term, tf in terms.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term: w / norm for term, w in weights.items()}
+
+    def _index(self, key: str):
+        vector = self._vectors[key] = self._vectorize(self._terms[key])
+        for term, weight in vector.items():
+            self._postings[term][key] = weight
+
+    def _unindex(self, key: str):
+        for term in self._vectors.pop(key, ()):
+            self._postings[term].pop(key, None)
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def _invalidate(self, terms):
+        for term in terms:
+            for other in self._postings.get(term, ()):
+                self._neighbours.pop(other, None)
+
+    def rebuild(self):
+        self._idf = {term: math.log((len(self.docs) + 1) / (df + 1)) + 1
+                     for term, df in self._df.items()}
+        self._postings.clear()
+        self._vectors.clear()
+        self._neighbours.clear()
+        for key in self.docs:
+            self._index(key)
+        self._changes = 0
+
+    def upsert(self, key: str, name: str, url: str = None, description: str = None):
+        """Add or replace one category."""
+        doc = {"name": name, "url": url, "description": description}
+        if self.docs.get(key) == doc:
+            return
+        old_terms = self._remove_terms(key)
+        self.docs[key] = doc
+        self._terms[key] = self._doc_terms(doc)
+        self._df.update(self._terms[key].keys())
+        self._index(key)
+        self._invalidate(set(old_terms) | set(self._terms[key]))
+        self._neighbours.pop(key, None)
+        self._note_change()
+
+    def remove(self, key: str):
+        if key not in self.docs:
+            return
+        # Only categories sharing a term with this one can have it cached as
+        # a neighbour, and _remove_terms drops exactly those.
+        self._remove_terms(key)
+        del self.docs[key]
+        self._neighbours.pop(key, None)
+        self._note_change()
+
+    def _remove_terms(self, key: str):
+        old_terms = self._terms.pop(key, Counter())
+        if old_terms:
+            self._invalidate(old_terms)
+            self._unindex(key)
+            self._df.subtract(old_terms.keys())
+            self._df += Counter()
+        return old_terms
+
+    def _note_change(self):
+        self._changes += 1
+        if self._changes > max(10, self.rebuild_ratio * len(self.docs)):
+            self.rebuild()
+
+    def _top(self, vector: dict, k: int, exclude) -> list:
+        scores = defaultdict(float)
+        for term, weight in vector.items():
+            for other, other_weight in self._postings.get(term, {}).items():
+                scores[other] += weight * other_weight
+        ranked = sorted(((score, key) for key, score in scores.items() if key not in exclude),
+                        key=lambda item: (-item[0], item[1]))
+        return [dict(self.docs[key], key=key, score=round(score, 4)) for score, key in ranked[:k]]
+
+    def related(self, key: str, k: int = 4, exclude=()) -> list:
+        """The `k` categories most similar to category `key`."""
+        # Cached lists are kept a little longer than asked for so that small
+        # exclusion sets can still be served from them.
+        limit, cached = self._neighbours.get(key, (0, None))
+        if cached is None or limit < k + len(exclude):
+            limit = k + len(exclude) + 4
+            cached = self._top(self._vectors[key], limit, {key})
+            self._neighbours[key] = (limit, cached)
+        return [item for item in cached if item["key"] not in exclude][:k]
+
+    def query(self, text: str, k: int = 4, exclude=()) -> list:
+        """Categories most similar to arbitrary text (e.g. a blog post)."""
+        vector = self._vectorize(Counter(tokenize(text)), store=False)
+        return self._top(vector, k, set(exclude))
+
+    def to_dict(self) -> dict:
+        return {"name_weight": self.name_weight, "docs": self.docs}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InterlinkIndex":
+        index = cls(name_weight=data.get("name_weight", 3))
+        for key, doc in data["docs"].items():
+            index.docs[key] = doc
+            index._terms[key] = index._doc_terms(doc)
+            index._df.update(index._terms[key].keys())
+        index.rebuild()
+        return index
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> "InterlinkIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def main():
+    from app.categories import build_interlink_index
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tree", help="category tree (.json or .csv)")
+    parser.add_argument("category", help="category name or URL")
+    parser.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    index = build_interlink_index(args.tree)
+    key = next((key for key, doc in index.docs.items()
+                if args.category in (key, doc["name"], doc["url"])), None)
+    if key is None:
+        parser.error(f"unknown category: {args.category}")
+    for item in index.related(key, args.k):
+        print(f"{item['score']:.3f}  {item['name']}  {item['url'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+import uuid
+
+from app import db, settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    job_id TEXT NOT NULL,
+    step TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (job_id, step)
+);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobInterrupted(Exception):
+    """A job was stopped because its worker is shutting down; it will resume."""
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+class JobQueue:
+    """Job queue shared by every worker process through SQLite.
+
+    A claimed job carries a lease that the owner keeps extending while it
+    runs. If the owner dies the lease expires and any worker may claim the
+    job again.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.STATE_DB
+        db.ensure_schema(self.path, SCHEMA)
+
+    def enqueue(self, kind: str, payload: dict, dedupe_key: str = None) -> str:
+        now = time.time()
+        with db.transaction(self.path) as conn:
+            if dedupe_key:
+                # Identical work already waiting or running: share it
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedupe_key = ? AND status IN (?, ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (dedupe_key, QUEUED, RUNNING)).fetchone()
+                if row is not None:
+                    return row["id"]
+                # The last attempt failed (e.g. the LLM provider was down):
+                # queue it again so it resumes from its checkpoints
+                row = conn.execute(
+                    "SELECT id, status FROM jobs WHERE dedupe_key = ? "
+                    "ORDER BY created_at DESC LIMIT 1", (dedupe_key,)).fetchone()
+                if row is not None and row["status"] == FAILED:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = NULL, owner = NULL, updated_at = ? "
+                        "WHERE id = ?", (QUEUED, now, row["id"]))
+                    return row["id"]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, dedupe_key, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), dedupe_key, QUEUED, now, now))
+        return job_id
+
+    def claim(self, worker: str, lease: float = None):
+        """Take the oldest runnable job, or return None if there is none."""
+        lease = lease or settings.JOB_LEASE_SECONDS
+        now = time.time()
+        owner = f"{worker}/{uuid.uuid4().hex[:8]}"
+        with db.transaction(self.path) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,)).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND lease_expires < ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (RUNNING, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now + lease, now, row["id"]))
+        job = _row_to_job(row)
+        job.update(status=RUNNING, owner=owner, attempts=job["attempts"] + 1)
+        return job
+
+    def _update_owned(self, job_id: str, owner: str, sql: str, params: tuple) -> bool:
+        cur = db.connect(self.path).execute(
+            f"UPDATE jobs SET {sql}, updated_at = ? WHERE id = ? AND owner = ? AND status = ?",
+            params + (time.time(), job_id, owner, RUNNING))
+        return cur.rowcount == 1
+
+    def heartbeat(self, job_id: str, owner: str, lease: float = None) -> bool:
+        """Extend the lease. False means the job was taken away from us."""
+        lease = lease or settings.JOB_LEASE_SECONDS
+        return self._update_owned(job_id, owner, "lease_expires = ?", (time.time() + lease,))
+
+    def complete(self, job_id: str, owner: str, result) -> bool:
+        return self._update_owned(
+            job_id, owner, "status = ?, result = ?, lease_expires = NULL",
+            (DONE, json.dumps(result)))
+
+    def fail(self, job_id: str, owner: str, error: str) -> bool:
+        return self._update_owned(
+            job_id, owner, "status = ?, error = ?, lease_expires = NULL", (FAILED, error))
+
+    def release(self, job_id: str, owner: str) -> bool:
+        """Hand a running job back to the queue so another worker picks it up."""
+        return self._update_owned(
+            job_id, owner, "status = ?, owner = NULL, lease_expires = NULL", (QUEUED,))
+
+    def get(self, job_id: str):
+        row = db.connect(self.path).execute(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row)
+
+    def save_checkpoint(self, job_id: str, step: str, output):
+        db.connect(self.path).execute(
+            "INSERT OR REPLACE INTO checkpoints (job_id, step, output, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (job_id, step, json.dumps(output), time.time()))
+
+    def checkpoints(self, job_id: str) -> dict:
+        """Outputs of the steps this job already finished, by step name."""
+        rows = db.connect(self.path).execute(
+            "SELECT step, output FROM checkpoints WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["step"]: json.loads(row["output"]) for row in rows}
+
+    def delete_checkpoint(self, job_id: str, step: str):
+        db.connect(self.path).execute(
+            "DELETE FROM checkpoints WHERE job_id = ? AND step = ?", (job_id, step))
+
+    def clear_checkpoints(self, job_id: str):
+        db.connect(self.path).execute("DELETE FROM checkpoints WHERE job_id = ?", (job_id,))
+
+    async def wait(self, job_id: str, timeout: float = None, interval: float = None,
+                   abort: asyncio.Event = None):
+        """Poll until the job is done or failed and return it.
+
+        Setting `abort` stops waiting (the job itself keeps going).
+        """
+        timeout = timeout or settings.JOB_TIMEOUT
+        interval = interval or settings.JOB_POLL_INTERVAL
+        deadline = time.monotonic() + timeout
+        while True:
+            if abort is not None and abort.is_set():
+                raise JobInterrupted(job_id)
+            job = await asyncio.to_thread(self.get, job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job["status"] in (DONE, FAILED):
+                return job
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} did not finish within {timeout}s")
+            await asyncio.sleep(interval)
+
+    def purge(self, older_than: float):
+        """Delete finished jobs older than `older_than` seconds."""
+        with db.transaction(self.path) as conn:
+            params = (DONE, FAILED, time.time() - older_than)
+            conn.execute(
+                "DELETE FROM checkpoints WHERE job_id IN (SELECT id FROM jobs "
+                "WHERE status IN (?, ?) AND updated_at < ?)", params)
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", params)
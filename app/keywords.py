@@ -0,0 +1,526 @@
+"""Keyword density optimisation for existing posts.
+
+Replaces the keyword crews of crap/crap2/keywordensity.py and
+keyworddensity2.py, which handled one hard-coded keyword per run and
+rewrote the whole post each time. Here a set of keywords with target
+density ranges is optimised together:
+
+1. one pass over the post counts every keyword and decides, per keyword,
+   whether sentences must be added or occurrences replaced;
+2. the paragraphs to extend are picked locally by topical similarity;
+3. one batched model call writes all new sentences and all synonyms;
+4. the merged edit plan is projected against every keyword's range (new
+   sentences dilute all keywords and also count for the keywords inside
+   their own, e.g. "flowers" in "wild flowers") and applied in one pass
+   only if every keyword lands in range.
+
+    python -m app.keywords crap/crap2/post.txt --keyword "poppy seeds=1-2.5" --keyword poppy
+"""
+import argparse
+import html
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from app import seo, settings
+from app.business import get_profile
+from app.interlinks import InterlinkIndex
+
+HTML_PARAGRAPH_RE = re.compile(r"<p\b[^>]*>(.*?)</p>", re.IGNORECASE | re.DOTALL)
+TEXT_PARAGRAPH_RE = re.compile(r"(?:^|\n\n)([^\n#<][^\n]*(?:\n(?!\n)[^\n]*)*)")
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+# Markup and entities are blanked out (same length) before words are found,
+# so word offsets point straight into the original content
+MARKUP_RE = re.compile(r"<(script|style|head|title)\b.*?</\1\s*>|<[^>]*>|&#?\w+;",
+                       re.IGNORECASE | re.DOTALL)
+WORD_RE = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+
+TARGET_DENSITY = 1.5
+MIN_PARAGRAPH_WORDS = 20
+MAX_PER_PARAGRAPH = 3
+MAX_SENTENCE_WORDS = 40
+# Used to estimate how much the new sentences dilute every density
+AVG_SENTENCE_WORDS = 18
+MAX_PLAN_ROUNDS = 20
+
+
+@dataclass
+class Target:
+    """A keyword and the density range (in % of words) it should end up in."""
+
+    keyword: str
+    low: float = seo.KEYWORD_DENSITY_RANGE[0]
+    high: float = seo.KEYWORD_DENSITY_RANGE[1]
+    goal: float = None
+
+    def __post_init__(self):
+        self.words = tuple(WORD_RE.findall(self.keyword.lower()))
+        if self.goal is None:
+            self.goal = (self.low + self.high) / 2
+
+    @classmethod
+    def parse(cls, spec: str) -> "Target":
+        """"poppy seeds" or "poppy seeds=1-2.5"."""
+        keyword, _, density = spec.partition("=")
+        if not density:
+            return cls(keyword.strip())
+        low, high = (float(n) for n in density.split("-"))
+        return cls(keyword.strip(), low, high)
+
+
+@dataclass
+class Analysis:
+    words: int
+    # keyword -> [(start, end)] character spans in the content
+    occurrences: dict
+
+    def density(self, target: Target, words: int = None) -> float:
+        words = words or self.words
+        return round(100.0 * len(self.occurrences[target.keyword]) * len(target.words) / words, 2) \
+            if words else 0.0
+
+
+class Paragraph:
+    """A paragraph of the post and where its text ends in the source."""
+
+    def __init__(self, index: int, text: str, end: int, is_html: bool):
+        self.index = index
+        self.text = text
+        self.end = end
+        self.is_html = is_html
+
+
+@dataclass
+class EditPlan:
+    analysis: Analysis
+    targets: list
+    # keyword -> sentences to add / occurrence spans to replace
+    adds: dict = field(default_factory=dict)
+    replaces: dict = field(default_factory=dict)
+    # (paragraph, keyword) for every sentence to write
+    slots: list = field(default_factory=list)
+    projected_words: int = 0
+    # keyword -> density once the slots and replacements are applied
+    projected: dict = field(default_factory=dict)
+    # keywords the plan would leave out of range, with why
+    problems: list = field(default_factory=list)
+
+
+def analyze(content: str, targets: list) -> Analysis:
+    """Count every keyword in one pass over the post's words.
+
+    Keywords are looked up by their first word, so the cost depends on the
+    length of the post rather than on the number of keywords.
+    """
+    visible = MARKUP_RE.sub(lambda match: " " * len(match.group(0)), content).lower()
+    tokens = [(match.group(0), match.start(), match.end()) for match in WORD_RE.finditer(visible)]
+    by_first = {}
+    for target in targets:
+        if target.words:
+            by_first.setdefault(target.words[0], []).append(target)
+    occurrences = {target.keyword: [] for target in targets}
+    for i, (word, start, _) in enumerate(tokens):
+        for target in by_first.get(word, ()):
+            n = len(target.words)
+            if tuple(token[0] for token in tokens[i:i + n]) == target.words:
+                occurrences[target.keyword].append((start, tokens[i + n - 1][2]))
+    return Analysis(words=len(tokens), occurrences=occurrences)
+
+
+def paragraphs(content: str) -> list:
+    """Body paragraphs of HTML (`<p>`) or text/markdown (blank-line separated)."""
+    is_html = bool(HTML_PARAGRAPH_RE.search(content))
+    regex = HTML_PARAGRAPH_RE if is_html else TEXT_PARAGRAPH_RE
+    found = []
+    for match in regex.finditer(content):
+        text = seo.plain_text(match.group(1)).strip() if is_html else match.group(1).strip()
+        if len(seo.WORD_RE.findall(text)) >= MIN_PARAGRAPH_WORDS:
+            found.append(Paragraph(len(found), text, match.end(1), is_html))
+    return found
+
+
+def max_added_density(target: Target) -> float:
+    """Density that sentences using the keyword once each approach but never reach."""
+    return 100.0 * (len(target.words) or 1) / AVG_SENTENCE_WORDS
+
+
+def sentences_needed(words: int, count: int, target: Target, density: float = None) -> int:
+    """New sentences (each using the keyword once) to reach `density` (default: the goal).
+
+    Raises ValueError when it can't be reached by adding sentences.
+    """
+    density = target.goal if density is None else density
+    n = len(target.words) or 1
+    missing = density * words - 100.0 * count * n
+    if missing <= 1e-9:
+        return 0
+    per_sentence = 100.0 * n - density * AVG_SENTENCE_WORDS
+    if per_sentence <= 0:
+        raise ValueError(f'"{target.keyword}" can\'t reach {density}% by adding sentences '
+                         f"(at most {max_added_density(target):.1f}%)")
+    return math.ceil(missing / per_sentence)
+
+
+def contains(outer: Target, inner: Target) -> int:
+    """How often `inner`'s words occur in `outer`'s (1 for the same keyword)."""
+    n = len(inner.words)
+    if not n:
+        return 0
+    return sum(1 for i in range(len(outer.words) - n + 1) if outer.words[i:i + n] == inner.words)
+
+
+def _added(targets: list, sentences: dict) -> dict:
+    """Occurrences of every keyword gained from `sentences` new sentences per keyword."""
+    by_keyword = {target.keyword: target for target in targets}
+    return {target.keyword: sum(n * contains(by_keyword[keyword], target) for keyword, n in sentences.items())
+            for target in targets}
+
+
+def _spread(items: list, count: int) -> list:
+    """`count` items picked evenly, never the first (it is usually the intro)."""
+    candidates = items[1:] if len(items) > count else items
+    if count >= len(candidates):
+        return list(candidates)
+    step = len(candidates) / count
+    return [candidates[int(i * step)] for i in range(count)]
+
+
+def _overlaps(span, spans) -> bool:
+    return any(span[0] < other[1] and other[0] < span[1] for other in spans)
+
+
+def plan_edits(content: str, targets: list, paras: list = None) -> EditPlan:
+    """All additions and replacements for `targets`, from a single analysis.
+
+    Sentences are only added up to the low end of a range. Every sentence
+    dilutes all keywords and also counts for the keywords inside its own,
+    so the counts are solved together, longest keywords first, until no
+    keyword is short. The finished plan is projected against every range
+    (see `verify`).
+    """
+    analysis = analyze(content, targets)
+    plan = EditPlan(analysis=analysis, targets=targets)
+    counts = {target.keyword: len(analysis.occurrences[target.keyword]) for target in targets}
+    by_length = sorted(targets, key=lambda target: -len(target.words))
+    adds = {}
+    for _ in range(MAX_PLAN_ROUNDS):
+        changed = False
+        for target in by_length:
+            words = analysis.words + AVG_SENTENCE_WORDS * sum(adds.values())
+            count = counts[target.keyword] + _added(targets, adds)[target.keyword]
+            more = sentences_needed(words, count, target, target.low)
+            if more:
+                adds[target.keyword] = adds.get(target.keyword, 0) + more
+                changed = True
+        if not changed:
+            break
+    plan.adds = adds
+    words = plan.projected_words = analysis.words + AVG_SENTENCE_WORDS * sum(adds.values())
+    gained = _added(targets, adds)
+
+    # Replacements never touch an occurrence shared with a keyword that is
+    # within its range (e.g. "flowers" inside a "wild flowers" that must
+    # stay). Longer phrases go first; replacing one lowers the counts of the
+    # keywords inside it, which the shorter keywords then take into account,
+    # and the occurrences a keyword keeps are protected from the others.
+    def over(target, count):
+        return 100.0 * count * len(target.words) / (words or 1) > target.high
+
+    protected = [span for target in targets
+                 if not over(target, counts[target.keyword] + gained[target.keyword])
+                 for span in analysis.occurrences[target.keyword]]
+    taken = []
+    for target in by_length:
+        if not over(target, counts[target.keyword] + gained[target.keyword]):
+            continue
+        spans = analysis.occurrences[target.keyword]
+        count = len(spans) - sum(1 for span in spans if _overlaps(span, taken)) + gained[target.keyword]
+        excess = count - math.floor(target.goal * words / (100.0 * (len(target.words) or 1)))
+        if over(target, count) and excess > 0:
+            free = [span for span in spans
+                    if not _overlaps(span, protected) and not _overlaps(span, taken)]
+            chosen = _spread(free, excess)
+            taken.extend(chosen)
+            plan.replaces[target.keyword] = chosen
+        protected.extend(span for span in spans if span not in taken)
+
+    plan.slots = plan_slots(paras if paras is not None else paragraphs(content), plan.adds)
+    verify(plan)
+    return plan
+
+
+def verify(plan: EditPlan) -> list:
+    """Project every keyword's density once the plan is applied; return the problems.
+
+    Uses the slots actually planned (paragraph room may have capped them)
+    and the occurrences that replacements remove.
+    """
+    analysis, targets = plan.analysis, plan.targets
+    sentences = {}
+    for _, keyword in plan.slots:
+        sentences[keyword] = sentences.get(keyword, 0) + 1
+    gained = _added(targets, sentences)
+    replaced = [span for spans in plan.replaces.values() for span in spans]
+    words = analysis.words + AVG_SENTENCE_WORDS * len(plan.slots)
+    plan.projected, plan.problems = {}, []
+    for target in targets:
+        spans = analysis.occurrences[target.keyword]
+        count = len(spans) - sum(1 for span in spans if _overlaps(span, replaced)) + gained[target.keyword]
+        density = round(100.0 * count * len(target.words) / words, 2) if words else 0.0
+        plan.projected[target.keyword] = density
+        if not target.low <= density <= target.high:
+            plan.problems.append(f'"{target.keyword}" would end at {density}% '
+                                 f"(range {target.low}-{target.high}%)")
+    return plan.problems
+
+
+def rank_paragraphs(index: InterlinkIndex, paras: list, keyword: str) -> list:
+    """Paragraphs ordered by topical similarity to the keyword.
+
+    The query is the keyword plus the paragraphs that already use it, so
+    paragraphs about the same topic rank high even without the exact words.
+    """
+    using = [para.text for para in paras if seo.keyword_density(para.text, keyword)[0]]
+    query = " ".join([keyword] * 3 + using)
+    scored = {int(item["key"]): item["score"] for item in index.query(query, k=len(paras))}
+    return sorted(paras, key=lambda para: (-scored.get(para.index, 0.0), para.index))
+
+
+def plan_slots(paras: list, adds: dict) -> list:
+    """(paragraph, keyword) for each new sentence.
+
+    Keywords take turns picking their best ranked paragraph, spreading over
+    paragraphs before stacking, with at most MAX_PER_PARAGRAPH new sentences
+    per paragraph whatever the keyword.
+    """
+    if not paras or not any(adds.values()):
+        return []
+    index = InterlinkIndex(name_weight=1)
+    for para in paras:
+        index.upsert(str(para.index), "", description=para.text)
+    index.rebuild()
+    ranked = {keyword: rank_paragraphs(index, paras, keyword) for keyword, n in adds.items() if n}
+    load = {para.index: 0 for para in paras}
+    used = {keyword: set() for keyword in ranked}
+    remaining = {keyword: adds[keyword] for keyword in ranked}
+    slots = []
+    while any(n > 0 for n in remaining.values()):
+        for keyword in ranked:
+            if remaining[keyword] <= 0:
+                continue
+            # Fresh paragraphs first, then any with room left
+            open_paras = [para for para in ranked[keyword] if load[para.index] < MAX_PER_PARAGRAPH]
+            choice = next((para for para in open_paras if para.index not in used[keyword]),
+                          open_paras[0] if open_paras else None)
+            if choice is None:
+                remaining[keyword] = 0
+                continue
+            slots.append((choice, keyword))
+            load[choice.index] += 1
+            used[keyword].add(choice.index)
+            remaining[keyword] -= 1
+    return sorted(slots, key=lambda slot: slot[0].index)
+
+
+def batch_prompt(title: str, plan: EditPlan, content: str, business=None) -> str:
+    others = [target.keyword for target in plan.targets]
+    lines = [f'You are adjusting keyword usage in the blog post "{title}". Answer with JSON only:',
+             '{"sentences": [{"slot": <number>, "sentence": "<sentence>"}, ...], '
+             '"synonyms": {"<keyword>": ["<alternative>", ...]}}', ""]
+    if business is not None and business.prompt("audience", "tone"):
+        # New sentences should sound like the rest of the store's content
+        lines += ["Write for this business:", business.prompt("audience", "tone"), ""]
+    if plan.slots:
+        lines.append("sentences: for each numbered paragraph below, write ONE new sentence that fits "
+                     "at the end of it, contains the exact keyword given for it, adds new information "
+                     "and does not repeat another sentence.")
+        if len(others) > 1:
+            lines.append("Each sentence uses its keyword exactly once and no other keyword from this "
+                         "list, except inside its own: " + ", ".join(f'"{k}"' for k in others))
+        for number, (para, keyword) in enumerate(plan.slots, 1):
+            lines.append(f'[{number}] keyword "{keyword}": {para.text}')
+        lines.append("")
+    if plan.replaces:
+        lines.append("synonyms: for each keyword below, give 5-10 alternatives that fit where it is "
+                     "used in the post and do not contain the keyword itself.")
+        for keyword, spans in plan.replaces.items():
+            examples = "; ".join(_context(content, span) for span in spans[:3])
+            lines.append(f'- "{keyword}" (used like: {examples})')
+    return "\n".join(lines)
+
+
+def _context(content: str, span, width: int = 60) -> str:
+    text = MARKUP_RE.sub(" ", content[max(0, span[0] - width):span[1] + width])
+    return "..." + " ".join(text.split()) + "..."
+
+
+def _fake_reply(plan: EditPlan) -> str:
+    return json.dumps({
+        "sentences": [{"slot": number, "sentence": f"Our guide to {keyword} covers point {number} in more depth."}
+                      for number, (_, keyword) in enumerate(plan.slots, 1)],
+        "synonyms": {keyword: [f"related term {i}" for i in range(1, 6)] for keyword in plan.replaces}})
+
+
+def parse_reply(reply: str, plan: EditPlan) -> tuple:
+    """({slot number: sentence}, {keyword: [synonyms]}) keeping only valid entries."""
+    match = JSON_OBJECT_RE.search(reply or "")
+    try:
+        data = json.loads(match.group(0)) if match else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    by_keyword = {target.keyword: target for target in plan.targets}
+
+    sentences, seen = {}, set()
+    items = data.get("sentences")
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        number, sentence = item.get("slot"), " ".join(str(item.get("sentence") or "").split())
+        if not isinstance(number, int) or not 1 <= number <= len(plan.slots) or number in sentences:
+            continue
+        keyword = plan.slots[number - 1][1]
+        if sentence.lower() in seen or len(seo.WORD_RE.findall(sentence)) > MAX_SENTENCE_WORDS:
+            continue
+        # The plan counted the keyword once per sentence (and the keywords
+        # inside it); anything else would move another keyword
+        found = analyze(sentence, plan.targets).occurrences
+        if any(len(found[target.keyword]) != contains(by_keyword[keyword], target)
+               for target in plan.targets):
+            continue
+        seen.add(sentence.lower())
+        sentences[number] = sentence
+
+    synonyms = {}
+    offered = data.get("synonyms")
+    for keyword in plan.replaces:
+        values = offered.get(keyword) if isinstance(offered, dict) else None
+        synonyms[keyword] = [
+            value.strip() for value in (values if isinstance(values, list) else [])
+            if isinstance(value, str) and value.strip()
+            and not seo.keyword_density(value, keyword)[0]]
+    return sentences, synonyms
+
+
+def _match_case(original: str, replacement: str) -> str:
+    if original[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+def apply_plan(content: str, plan: EditPlan, sentences: dict, synonyms: dict) -> tuple:
+    """(content, {keyword: occurrences replaced}) with every edit applied in one pass."""
+    edits = []
+    by_end = {}
+    for number, sentence in sorted(sentences.items()):
+        para = plan.slots[number - 1][0]
+        by_end.setdefault(para.end, (para, []))[1].append(sentence)
+    for end, (para, added) in by_end.items():
+        text = " ".join(html.escape(s, quote=False) if para.is_html else s for s in added)
+        edits.append((end, end, " " + text))
+    replaced = {}
+    for keyword, spans in plan.replaces.items():
+        choices = synonyms.get(keyword) or []
+        if not choices:
+            continue
+        for i, (start, end) in enumerate(spans):
+            replacement = _match_case(content[start:end], choices[i % len(choices)])
+            edits.append((start, end, html.escape(replacement, quote=False)))
+        replaced[keyword] = len(spans)
+    # Back to front, so earlier offsets stay valid; spans never overlap
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1]), reverse=True):
+        if start == end:
+            content = content[:start].rstrip() + text + content[end:]
+        else:
+            content = content[:start] + text + content[end:]
+    return content, replaced
+
+
+def generate(title: str, plan: EditPlan, content: str, business=None) -> tuple:
+    """One model call for every sentence and synonym in the plan."""
+    from app.llm import get_llm
+
+    llm = get_llm(model_name="gpt-4o-2024-08-06", temperature=0.5, fake_response=_fake_reply(plan))
+    reply = llm.invoke(batch_prompt(title, plan, content, business)).content
+    return parse_reply(reply, plan)
+
+
+def optimize(content: str, targets: list, title: str = "", business=None) -> tuple:
+    """(new content, report) with every keyword moved into its density range.
+
+    `business` is an app.business.BusinessProfile whose audience and tone
+    the new sentences follow. Raises ValueError, without editing, when the
+    plan can't bring every keyword into range."""
+    plan = plan_edits(content, targets)
+    if plan.problems:
+        raise ValueError("; ".join(plan.problems))
+    sentences, replaced = {}, {}
+    if plan.slots or plan.replaces:
+        sentences, synonyms = generate(title or targets[0].keyword, plan, content, business)
+        content, replaced = apply_plan(content, plan, sentences, synonyms)
+    after = analyze(content, targets)
+    report = {"words": plan.analysis.words, "words_after": after.words, "keywords": {}}
+    for target in targets:
+        report["keywords"][target.keyword] = {
+            "range": [target.low, target.high],
+            "count": len(plan.analysis.occurrences[target.keyword]),
+            "density": plan.analysis.density(target),
+            "to_add": sum(1 for _, keyword in plan.slots if keyword == target.keyword),
+            "added": sum(1 for number in sentences if plan.slots[number - 1][1] == target.keyword),
+            "to_replace": len(plan.replaces.get(target.keyword, ())),
+            "density_planned": plan.projected[target.keyword],
+            "replaced": replaced.get(target.keyword, 0),
+            "density_after": after.density(target),
+        }
+    return content, report
+
+
+def add_keyword(content: str, keyword: str, title: str = "", target: float = TARGET_DENSITY) -> tuple:
+    """(new content, report) with sentences added until `keyword` reaches `target` %."""
+    return optimize(content, [Target(keyword, low=target, high=100.0, goal=target)], title=title)
+
+
+def _optimize_file(path: str, targets: list, out_dir: str, business=None) -> dict:
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    title = os.path.splitext(os.path.basename(path))[0]
+    content, report = optimize(content, targets, title=title, business=business)
+    os.makedirs(out_dir, exist_ok=True)
+    target_path = os.path.join(out_dir, os.path.basename(path))
+    with open(target_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    report["path"] = target_path
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="posts (HTML, markdown or text)")
+    parser.add_argument("--keyword", action="append", required=True, type=Target.parse,
+                        help='keyword, optionally with a density range: "poppy seeds=1-2.5"')
+    parser.add_argument("--out", default="out/keywords")
+    parser.add_argument("--concurrency", type=int, default=settings.KEYWORD_CONCURRENCY,
+                        help="posts optimised at once")
+    parser.add_argument("--business-url", help="store whose profile (app.business) sets audience and tone")
+    args = parser.parse_args()
+
+    business = get_profile(args.business_url) if args.business_url else None
+
+    # Model calls are throttled by app.llm.rate_limiter across all threads
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = {pool.submit(_optimize_file, path, args.keyword, args.out, business): path
+                   for path in args.paths}
+        for future in as_completed(futures):
+            try:
+                print(json.dumps(future.result()))
+            except Exception as e:
+                print(json.dumps({"path": futures[future], "error": str(e)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from app import settings
+
+log = logging.getLogger(__name__)
+
+FAKE_PARAGRAPH = (
+    "Local business automation helps small teams spend less time on repetitive "
+    "work such as booking, invoicing and follow ups, and more time with customers. "
+)
+
+_cache_lock = threading.Lock()
+_cache_installed = False
+
+
+class RateLimiter:
+    """Caps concurrent LLM calls and spaces them out to a requests-per-minute budget.
+
+    Used as a context manager around every model call made in this process.
+    """
+
+    def __init__(self, max_concurrent: int, rpm: float = 0):
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._interval = 60.0 / rpm if rpm else 0.0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def acquire(self):
+        self._slots.acquire()
+        if self._interval:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self._interval
+            if start > now:
+                time.sleep(start - now)
+
+    def release(self):
+        self._slots.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+rate_limiter = RateLimiter(settings.LLM_MAX_CONCURRENCY, settings.LLM_RPM)
+
+
+class AttemptCancelled(Exception):
+    pass
+
+
+UNAVAILABLE = "LLM unavailable"
+
+
+class LLMUnavailable(Exception):
+    """The provider kept failing after retries, or its circuit is open."""
+
+
+# Errors worth retrying: timeouts, connection resets, 429 and 5xx. Matched by
+# name so this module does not have to import openai or httpx.
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError",
+                    "InternalServerError", "ServiceUnavailableError", "Timeout",
+                    "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"}
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(exc, "status_code", None) in TRANSIENT_STATUS:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fails fast after `failures` transient errors in a row.
+
+    After `reset_after` seconds one trial call is let through; it closes the
+    circuit on success and opens it again on failure. A trial that ends
+    neither way (cancelled) is given back with `release()`.
+    """
+
+    def __init__(self, failures: int, reset_after: float):
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = threading.get_ident()
+                return True
+            return False
+
+    def release(self):
+        """Let another trial through if this thread's trial call did not settle."""
+        with self._lock:
+            if self._trial == threading.get_ident():
+                self._trial = False
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+
+class LLMMetrics:
+    """Per-model call, retry, fallback and breaker counters for this process."""
+
+    COUNTERS = ("calls", "successes", "errors", "transient_errors", "retries",
+                "fallbacks", "short_circuits")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._breakers = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(settings.LLM_BREAKER_FAILURES,
+                                                       settings.LLM_BREAKER_RESET)
+            return self._breakers[model]
+
+    def incr(self, model: str, counter: str):
+        with self._lock:
+            counts = self._counts.setdefault(model, dict.fromkeys(self.COUNTERS, 0))
+            counts[counter] += 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            models = {model: dict(counts) for model, counts in self._counts.items()}
+            for model, breaker in self._breakers.items():
+                models.setdefault(model, dict.fromkeys(self.COUNTERS, 0)).update(
+                    breaker=breaker.state, breaker_opened=breaker.opened,
+                    consecutive_failures=breaker.failures)
+        return {"pid": os.getpid(), "models": models}
+
+
+metrics = LLMMetrics()
+
+
+def backoff(retry: int) -> float:
+    """Full-jitter exponential backoff before retry number `retry` (from 1)."""
+    return random.uniform(0, min(settings.LLM_RETRY_MAX, settings.LLM_RETRY_BASE * 2 ** (retry - 1)))
+
+
+def call_resilient(model: str, call, fallback=None):
+    """`call()` with retries on transient errors behind `model`'s circuit breaker.
+
+    When the retries run out or the circuit is open, `fallback()` is used if
+    given; otherwise LLMUnavailable is raised. Other errors pass straight through
+    and count as a success for the breaker; AttemptCancelled counts as neither.
+    """
+    breaker = metrics.breaker(model)
+    error = None
+    for retry in range(settings.LLM_RETRIES + 1):
+        if not breaker.allow():
+            metrics.incr(model, "short_circuits")
+            break
+        if retry:
+            metrics.incr(model, "retries")
+            time.sleep(backoff(retry))
+        metrics.incr(model, "calls")
+        try:
+            result = call()
+        except AttemptCancelled:
+            # Says nothing about the endpoint
+            raise
+        except Exception as e:
+            metrics.incr(model, "errors")
+            if not is_transient(e):
+                # The endpoint answered; only transient errors count against it
+                breaker.success()
+                raise
+            metrics.incr(model, "transient_errors")
+            breaker.failure()
+            log.warning("transient model error", extra={"model": model, "retry": retry,
+                                                        "error": str(e), "breaker": breaker.state})
+            error = e
+            continue
+        else:
+            breaker.success()
+            metrics.incr(model, "successes")
+            return result
+        finally:
+            breaker.release()
+    if fallback is not None:
+        metrics.incr(model, "fallbacks")
+        log.warning("using fallback model", extra={"model": model, "breaker": breaker.state})
+        return fallback()
+    raise LLMUnavailable(f"{UNAVAILABLE} ({model}): {error or 'circuit open'}") from error
+
+
+class Attempt:
+    """Token meter and cancel switch for the model calls made inside `attempt()`.
+
+    Cancelling takes effect at the next model call; one already in flight
+    runs to completion.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def add_usage(self, usage: dict):
+        self.calls += 1
+        for key in self.usage:
+            self.usage[key] += (usage or {}).get(key) or 0
+
+
+_attempt = contextvars.ContextVar("llm_attempt", default=None)
+
+
+def current_attempt():
+    return _attempt.get()
+
+
+@contextmanager
+def attempt(current: Attempt):
+    token = _attempt.set(current)
+    try:
+        yield current
+    finally:
+        _attempt.reset(token)
+
+
+def fake_answer(words: int = 900) -> str:
+    """Canned answer in the format crewai agents expect to finish a task."""
+    paragraph_words = len(FAKE_PARAGRAPH.split())
+    body = "\n\n".join(FAKE_PARAGRAPH.strip() for _ in range(max(1, words // paragraph_words)))
+    return f"Thought: I now know the final answer\nFinal Answer: {body}"
+
+
+def install_llm_cache():
+    """Point LangChain at the shared LLM cache (once per process)."""
+    global _cache_installed
+    if not settings.LLM_CACHE or _cache_installed:
+        return
+    with _cache_lock:
+        if not _cache_installed:
+            from langchain_core.globals import set_llm_cache
+            from app.llm_backends import SharedLLMCache
+            set_llm_cache(SharedLLMCache())
+            _cache_installed = True
+
+
+def get_llm(model_name: str = "gpt-4-turbo", temperature: float = 0.8, fake_response: str = None):
+    """Chat model for agents and direct calls; `fake_response` is what it answers in fake mode."""
+    install_llm_cache()
+    if settings.LLM_MODE == "fake":
+        from app.llm_backends import FakeChatModel
+        return FakeChatModel(responses=[fake_response or fake_answer()])
+    from app.llm_backends import ChatModel
+    # Retries are done by app.llm.call_resilient, not by the OpenAI client
+    return ChatModel(model_name=model_name, temperature=temperature,
+                     request_timeout=settings.LLM_TIMEOUT, max_retries=0)
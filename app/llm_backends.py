@@ -0,0 +1,135 @@
+# LangChain classes used by app.llm. Importing this module pulls in
+# langchain_core and langchain_openai, so app.llm only imports it on first use.
+import random
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.load import dumps, loads
+from langchain_openai import ChatOpenAI
+
+from app import settings
+from app.cache import SharedCache, make_key
+from app.llm import AttemptCancelled, call_resilient, current_attempt, fake_answer, rate_limiter
+from app.profiling import span
+
+
+class SharedLLMCache(BaseCache):
+    """LangChain LLM cache backed by the shared SQLite state database."""
+
+    def __init__(self, ttl: float = None):
+        self._cache = SharedCache("llm", ttl=ttl or settings.LLM_CACHE_TTL)
+
+    def lookup(self, prompt: str, llm_string: str):
+        hit = self._cache.get(make_key(prompt, llm_string))
+        if hit is None:
+            return None
+        return [loads(generation) for generation in hit]
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        self._cache.set(make_key(prompt, llm_string),
+                        [dumps(generation) for generation in return_val])
+
+    def clear(self, **kwargs):
+        self._cache.clear()
+
+
+class _RateLimited:
+    """Mixin that runs every completion under the process-wide rate limiter
+    and charges it to the current `app.llm.attempt`, if any."""
+
+    # crewai's agent executor calls `.stream()`, which only falls back to
+    # `.invoke()` (LLM cache, then `_generate` below) for models that do not
+    # stream themselves. Nothing reads partial output, so don't.
+    _stream = BaseChatModel._stream
+    _astream = BaseChatModel._astream
+
+    def _generate(self, *args, **kwargs):
+        attempt = current_attempt()
+        self._check_cancelled(attempt)
+        with span("llm.wait"):
+            rate_limiter.acquire()
+        try:
+            # It may have lost while waiting for a slot
+            self._check_cancelled(attempt)
+            with span("llm.call", model=getattr(self, "model_name", type(self).__name__)):
+                result = super()._generate(*args, **kwargs)
+        finally:
+            rate_limiter.release()
+        if attempt is not None:
+            attempt.add_usage((result.llm_output or {}).get("token_usage"))
+        return result
+
+    @staticmethod
+    def _check_cancelled(attempt):
+        if attempt is not None and attempt.cancelled.is_set():
+            raise AttemptCancelled(attempt.name)
+
+
+class _Resilient(_RateLimited):
+    """Retries, circuit breaker and fallback model around every completion.
+
+    Backoff sleeps happen outside the rate limiter, so a retrying call does
+    not hold a slot.
+    """
+
+    def _breaker_key(self) -> str:
+        return self.model_name
+
+    def _has_fallback(self) -> bool:
+        return False
+
+    def _fallback(self):
+        """A new fallback model; only built once the primary has given up."""
+        raise NotImplementedError
+
+    def _generate(self, *args, **kwargs):
+        return call_resilient(
+            self._breaker_key(), lambda: super(_Resilient, self)._generate(*args, **kwargs),
+            (lambda: self._fallback()._generate(*args, **kwargs)) if self._has_fallback() else None)
+
+
+class ChatModel(_Resilient, ChatOpenAI):
+    def _has_fallback(self) -> bool:
+        return bool(settings.LLM_FALLBACK_MODEL) and self.model_name != settings.LLM_FALLBACK_MODEL
+
+    def _fallback(self):
+        return ChatModel(model_name=settings.LLM_FALLBACK_MODEL, temperature=self.temperature,
+                         request_timeout=settings.LLM_TIMEOUT, max_retries=0)
+
+
+class FakeChatModel(_Resilient, FakeListChatModel):
+    """Offline stand-in for ChatOpenAI with a configurable latency and error rate."""
+
+    def _breaker_key(self) -> str:
+        return "fake"
+
+    def _has_fallback(self) -> bool:
+        return bool(settings.LLM_FALLBACK_MODEL)
+
+    def _fallback(self):
+        return FakeFallbackChatModel(responses=[fake_answer()])
+
+    def _error_rate(self) -> float:
+        return settings.FAKE_LLM_ERROR_RATE
+
+    def _call(self, *args, **kwargs):
+        if settings.FAKE_LLM_LATENCY:
+            time.sleep(settings.FAKE_LLM_LATENCY)
+        if random.random() < self._error_rate():
+            raise TimeoutError("fake LLM timeout")
+        return super()._call(*args, **kwargs)
+
+
+class FakeFallbackChatModel(FakeChatModel):
+    """Stands in for LLM_FALLBACK_MODEL in fake mode; never fails."""
+
+    def _breaker_key(self) -> str:
+        return "fake:" + settings.LLM_FALLBACK_MODEL
+
+    def _has_fallback(self) -> bool:
+        return False
+
+    def _error_rate(self) -> float:
+        return 0.0
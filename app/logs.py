@@ -0,0 +1,171 @@
+"""Structured logging off the request path.
+
+Records are put on a bounded in-memory queue and written as JSON lines by a
+background thread, so a request never waits on console or file I/O. When the
+queue is full new records are dropped, and the number dropped is attached to
+the next record that gets through.
+
+Levels are set per component (logger name prefix) with LOG_LEVELS, e.g.
+"app.llm=DEBUG,crewai=WARNING". Agent thoughts and tool calls are no longer
+printed for every job: a LOG_TRACE_SAMPLE share of jobs (or any job run
+inside `job(..., verbose=True)`) logs them to the "app.trace" logger instead.
+"""
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+
+from app import settings
+
+_job = contextvars.ContextVar("log_job", default=None)
+
+# LogRecord attributes that are not `extra=` fields
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+trace_log = logging.getLogger("app.trace")
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 3), "level": record.levelname,
+                 "component": record.name, "msg": record.getMessage()}
+        entry.update((key, value) for key, value in vars(record).items()
+                     if key not in _STANDARD and not key.startswith("_"))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking."""
+
+    def __init__(self, size: int):
+        super().__init__(queue.Queue(maxsize=size))
+        self.dropped = 0
+        self.addFilter(_add_job)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only what must happen on the caller's thread: merge the arguments
+        # (they may change later) and render any traceback
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.dropped:
+            record.dropped, self.dropped = self.dropped, 0
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += getattr(record, "dropped", 0) + 1
+
+
+def _add_job(record: logging.LogRecord) -> bool:
+    current = _job.get()
+    if current is not None and not hasattr(record, "job_id"):
+        record.job_id = current[0]
+    return True
+
+
+def _levels(spec: str) -> dict:
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.rpartition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup():
+    """Route all logging through the background writer (safe to call repeatedly)."""
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+        if settings.LOG_FILE:
+            writer = logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+        else:
+            writer = logging.StreamHandler(sys.stderr)
+        writer.setFormatter(JsonFormatter())
+        _handler = _BoundedQueueHandler(settings.LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        root.handlers = [_handler]
+        root.setLevel(settings.LOG_LEVEL.upper())
+        for name, level in _levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+        _listener = logging.handlers.QueueListener(_handler.queue, writer)
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Write out whatever is queued and stop the writer."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def stats() -> dict:
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+def sampled(job_id: str) -> bool:
+    """Whether `job_id` gets a verbose trace; stable across retries of the job."""
+    if settings.LOG_TRACE_SAMPLE <= 0:
+        return False
+    bucket = int(hashlib.sha1(job_id.encode("utf-8")).hexdigest()[:8], 16) / 0x100000000
+    return bucket < settings.LOG_TRACE_SAMPLE
+
+
+@contextmanager
+def job(job_id: str, verbose: bool = None):
+    """Tag records logged inside the block with `job_id`.
+
+    Nested calls for the job that is already current change nothing.
+    """
+    current = _job.get()
+    if job_id is None or (current is not None and current[0] == job_id):
+        yield
+        return
+    token = _job.set((job_id, sampled(job_id) if verbose is None else verbose))
+    try:
+        yield
+    finally:
+        _job.reset(token)
+
+
+def verbose() -> bool:
+    """Whether the current job is traced verbosely."""
+    current = _job.get()
+    return bool(current and current[1]) and trace_log.isEnabledFor(logging.INFO)
+
+
+def agent_step(step):
+    """crewai step callback: one "app.trace" record per agent thought, tool call or answer."""
+    for item in step if isinstance(step, list) else [step]:
+        action = item[0] if isinstance(item, tuple) else item
+        fields = {"kind": type(action).__name__}
+        tool = getattr(action, "tool", None)
+        if tool:
+            fields.update(tool=tool, tool_input=str(getattr(action, "tool_input", ""))[:settings.LOG_TRACE_CHARS])
+        if isinstance(item, tuple) and len(item) > 1:
+            fields["observation"] = str(item[1])[:settings.LOG_TRACE_CHARS]
+        text = getattr(action, "log", None) or str(action)
+        trace_log.info(text[:settings.LOG_TRACE_CHARS], extra=fields)
+
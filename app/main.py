@@ -1,12 +1,23 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from app.services import BlogService
+from app.content_store import ContentStore
+from app.tools import tool_cache
+from app.profiling import TraceStore
+from app.worker import JobWorker
+from app.warmup import Warmup
+from app import llm, logs, memory, profiling, settings
 import asyncio
+import sqlite3
 
-import random
+logs.setup()
 
 app = FastAPI()
 
 blog_service = BlogService()
+job_worker = JobWorker()
+warmup = Warmup()
+content_store = ContentStore()
 
 
 @app.get("/")
@@ -14,10 +25,31 @@ async def root():
     return {"Hello": "World"}
 
 
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    body = {"status": warmup.status, "timings": warmup.timings}
+    if warmup.error:
+        body["error"] = warmup.error
+    if not warmup.ready or job_worker.draining:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+
 @app.get("/first")
-async def blog():
+async def blog(profile: bool = False):
+    if job_worker.draining:
+        raise HTTPException(
+            status_code=503, detail="Service is restarting, try again shortly.")
     try:
-        return await blog_service.generate_blog_post("Local Business Automation")
+        return await blog_service.generate_blog_post(
+            "Local Business Automation", abort=job_worker.drained, profile=profile)
+    except HTTPException:
+        raise
     except asyncio.CancelledError:
         # Handle task cancellation
         raise HTTPException(
@@ -38,8 +70,91 @@ async def test(limit: int):
     return {"test": limit}
 
 
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(blog_service.jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return {key: job[key] for key in ("id", "kind", "status", "result", "error", "attempts")}
+
+
+@app.get("/posts")
+async def list_posts(kind: str = None, headline: str = None, category: str = None,
+                     since: float = None, until: float = None, limit: int = 50, offset: int = 0):
+    return await asyncio.to_thread(content_store.list, kind=kind, headline=headline,
+                                   category=category, since=since, until=until,
+                                   limit=min(limit, 500), offset=offset)
+
+
+@app.get("/posts/search")
+async def search_posts(q: str, limit: int = 20):
+    try:
+        return await asyncio.to_thread(content_store.search, q, min(limit, 100))
+    except sqlite3.OperationalError as e:
+        # Malformed FTS5 query
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/posts/{post_id}")
+async def get_post(post_id: str):
+    post = await asyncio.to_thread(content_store.get, post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found.")
+    return post
+
+
+@app.get("/tools/stats")
+async def tool_stats():
+    return await asyncio.to_thread(tool_cache.stats)
+
+
+@app.get("/hedges")
+async def hedge_stats():
+    return await asyncio.to_thread(blog_service.hedge_log.summary)
+
+
+@app.get("/jobs/{job_id}/trace")
+async def job_trace(job_id: str, format: str = "chrome"):
+    trace = await asyncio.to_thread(TraceStore().get, job_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace for this job.")
+    if format == "folded":
+        return PlainTextResponse(profiling.folded(trace))
+    return trace
+
+
+@app.get("/memory")
+async def memory_stats():
+    # This worker's RSS and recycling state, and the latest jobs of all workers
+    return {"worker": job_worker.memory_stats(),
+            "jobs": await asyncio.to_thread(memory.MemoryLog().recent)}
+
+
+@app.get("/logs/stats")
+async def log_stats():
+    # Records waiting for the writer and dropped since the last one got through
+    return logs.stats()
+
+
+@app.get("/llm/metrics")
+async def llm_metrics():
+    # Counters and breaker state of the worker process that answers
+    return llm.metrics.to_dict()
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Heavy imports happen in the background so probes pass right away
+    warmup.start()
+    job_worker.install_signal_hooks()
+    if settings.JOB_CONSUMER:
+        app.state.job_worker_task = asyncio.create_task(job_worker.run())
+
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Finish or requeue this worker's own jobs before tearing the loop down
+    await job_worker.drain()
     tasks = [task for task in asyncio.all_tasks(
     ) if task is not asyncio.current_task()]
     [task.cancel() for task in tasks]
@@ -0,0 +1,165 @@
+"""Memory accounting per job, and bounds on what jobs keep in memory.
+
+Every job records the worker's RSS when it starts and ends and the peak seen
+by a sampler thread while it runs. With MEMORY_TRACEMALLOC=1 the Python heap
+is traced as well, and the allocation sites that grew most during the job
+are kept with it (tracing is process-wide, so with several jobs running at
+once the numbers overlap).
+
+Tool results (web pages, documents) are capped at TOOL_OUTPUT_CHARS before
+they are returned or cached; anything longer is spilled to a file under
+DATA_DIR/spill and the caller gets the head of it with the file's path.
+Workers use `rss_mb()` to decide when to recycle.
+"""
+import hashlib
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from app import db, settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_memory (
+    job_id TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    rss_start_mb REAL NOT NULL,
+    rss_end_mb REAL NOT NULL,
+    rss_peak_mb REAL NOT NULL,
+    heap_peak_mb REAL,
+    top_allocations TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_memory_created ON job_memory (created_at);
+"""
+
+log = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 1048576
+    except OSError:
+        # No /proc (macOS): the peak is the best available figure
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1048576
+
+
+def start_tracing():
+    if settings.MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+
+
+class MemoryLog:
+    """Memory figures of every job, shared by all workers."""
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.STATE_DB
+        db.ensure_schema(self.path, SCHEMA)
+
+    def record(self, job_id: str, usage: dict):
+        db.connect(self.path).execute(
+            "INSERT INTO job_memory (job_id, pid, seconds, rss_start_mb, rss_end_mb, rss_peak_mb, "
+            "heap_peak_mb, top_allocations, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, os.getpid(), usage["seconds"], usage["rss_start_mb"], usage["rss_end_mb"],
+             usage["rss_peak_mb"], usage.get("heap_peak_mb"),
+             json.dumps(usage["top_allocations"]) if usage.get("top_allocations") else None,
+             time.time()))
+
+    def recent(self, limit: int = 20) -> list:
+        rows = db.connect(self.path).execute(
+            "SELECT * FROM job_memory ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        jobs = [dict(row) for row in rows]
+        for job in jobs:
+            job["top_allocations"] = json.loads(job["top_allocations"]) if job["top_allocations"] else None
+        return jobs
+
+
+@contextmanager
+def track(job_id: str, store: MemoryLog = None):
+    """Measure the memory of the block and record it under `job_id`."""
+    usage = {"rss_start_mb": round(rss_mb(), 1)}
+    peak = [usage["rss_start_mb"]]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(settings.MEMORY_SAMPLE_INTERVAL):
+            peak[0] = max(peak[0], rss_mb())
+
+    sampler = threading.Thread(target=sample, name=f"memory-{job_id}", daemon=True)
+    sampler.start()
+    before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+    if before is not None:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        stop.set()
+        sampler.join()
+        usage["seconds"] = round(time.perf_counter() - started, 3)
+        usage["rss_end_mb"] = round(rss_mb(), 1)
+        usage["rss_peak_mb"] = round(max(peak[0], usage["rss_end_mb"]), 1)
+        if before is not None:
+            usage["heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1048576, 1)
+            own = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            growth = tracemalloc.take_snapshot().filter_traces(own).compare_to(
+                before.filter_traces(own), "lineno")[:5]
+            usage["top_allocations"] = [{"where": str(stat.traceback[0]), "kb": round(stat.size_diff / 1024, 1)}
+                                        for stat in growth if stat.size_diff > 0]
+        (store or MemoryLog()).record(job_id, usage)
+        log.info("job memory", extra={key: value for key, value in usage.items() if key != "top_allocations"})
+
+
+def spill_dir() -> str:
+    return os.path.join(settings.DATA_DIR, "spill")
+
+
+def spill(text: str) -> str:
+    """Write `text` to a file named by its hash (once) and return the path."""
+    path = os.path.join(spill_dir(), hashlib.sha256(text.encode("utf-8")).hexdigest()[:32] + ".txt")
+    if not os.path.exists(path):
+        os.makedirs(spill_dir(), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return path
+
+
+def bounded(text, limit: int = None):
+    """`text` if it is short enough, else its head plus the path of a spill file."""
+    limit = settings.TOOL_OUTPUT_CHARS if limit is None else limit
+    if not isinstance(text, str) or not limit or len(text) <= limit:
+        return text
+    path = spill(text)
+    return (f"{text[:limit]}\n\n[Output cut at {limit} of {len(text)} characters; "
+            f"the full text is in {path}]")
+
+
+def clean_spills(max_age: float = None):
+    """Delete spill files older than `max_age` seconds."""
+    max_age = settings.SPILL_TTL if max_age is None else max_age
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(spill_dir())
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(spill_dir(), name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
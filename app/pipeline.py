@@ -0,0 +1,226 @@
+import logging
+import threading
+import time
+
+from app import llm, logs, settings
+from app.cache import SharedCache, make_key
+from app.jobs import JobQueue, JobInterrupted
+from app.profiling import span
+
+log = logging.getLogger(__name__)
+
+USAGE_KEYS = ("prompt_tokens", "completion_tokens", "total_tokens", "successful_requests")
+
+_telemetry_lock = threading.Lock()
+
+
+def usage_of(crew, result) -> dict:
+    """Token usage of a finished crew, across crewai versions."""
+    usage = getattr(result, "token_usage", None) or getattr(crew, "usage_metrics", None) or {}
+    if not isinstance(usage, dict):
+        usage = {key: getattr(usage, key, 0) for key in USAGE_KEYS}
+    return {key: usage.get(key) or 0 for key in USAGE_KEYS}
+
+
+def share_crew_telemetry():
+    """Have every crew use one crewai Telemetry object per process.
+
+    crewai 0.28 builds a Telemetry, with its own TracerProvider and span
+    export thread, for every Crew (and every tool use), whatever
+    OTEL_SDK_DISABLED says. Only the first becomes the global provider that
+    spans go to; the rest are never shut down and register fork hooks that
+    can't be removed, so a worker grew with every job. Reusing the first one
+    sends exactly what was sent before.
+    """
+    from crewai import crew
+    from crewai.telemetry import Telemetry
+    from crewai.tools import tool_usage
+
+    with _telemetry_lock:
+        if crew.Telemetry is Telemetry:
+            shared = Telemetry()
+            crew.Telemetry = tool_usage.Telemetry = lambda: shared
+
+
+def fingerprint(step: "Step", description: str) -> str:
+    """Hash of everything a step's output depends on.
+
+    `description` is the final task text, which already holds the upstream
+    outputs the step consumes and any review findings.
+    """
+    agent = step.agent
+    model = getattr(agent, "llm", None)
+    return make_key("step", step.name, description, step.expected_output,
+                    getattr(agent, "role", None), getattr(agent, "goal", None),
+                    getattr(agent, "backstory", None), getattr(model, "model_name", None),
+                    getattr(model, "temperature", None))
+
+
+class Step:
+    """One agent task in a pipeline.
+
+    `context` names the earlier steps whose outputs are handed to this one;
+    by default it gets the output of the step right before it, like a
+    sequential crew.
+
+    `review` makes the step conditional: it is called with the outputs so
+    far and returns the problems found (text) or nothing. With nothing to
+    fix the agent is not called and its input passes through unchanged;
+    otherwise the problems are appended to the task description.
+
+    `hedge` (an `app.hedge.Hedge`) races a second attempt against a slow one.
+    """
+
+    def __init__(self, name: str, agent, description: str, expected_output: str, context=None,
+                 review=None, hedge=None):
+        self.name = name
+        self.agent = agent
+        self.description = description
+        self.expected_output = expected_output
+        self.context = context
+        self.review = review
+        self.hedge = hedge
+
+
+class Pipeline:
+    """Runs steps one at a time and checkpoints each finished output.
+
+    With a `job_id`, outputs are stored in the shared job database as soon as
+    a step finishes, and a re-run of the same job (after a restart or when
+    another worker takes it over) skips straight to the first unfinished step.
+
+    With `incremental`, every output is kept under the fingerprint of its
+    inputs instead, like an incremental build: a step whose prompt, agent and
+    upstream outputs are unchanged since an earlier run reuses that output
+    instead of calling the model, and only its changed dependants rerun. That
+    is also how an interrupted incremental job resumes; a job checkpoint
+    would be reused even after its inputs changed.
+    """
+
+    def __init__(self, job_id: str = None, queue: JobQueue = None, interrupt=None,
+                 incremental: bool = False):
+        self.job_id = job_id
+        self.queue = queue or JobQueue()
+        self.interrupt = interrupt
+        self.results = SharedCache("step", ttl=settings.STEP_RESULT_TTL) if incremental else None
+        # Per step run in this process: seconds and token usage
+        self.stats = {}
+
+    def run(self, steps, done: dict = None) -> dict:
+        """Run `steps` in order; steps already in `done` (or checkpointed) are reused."""
+        with logs.job(self.job_id):
+            return self._run(steps, done)
+
+    def _run(self, steps, done):
+        done = dict(done or {})
+        checkpoints = self.job_id and self.results is None
+        if checkpoints:
+            done.update(self.queue.checkpoints(self.job_id))
+        outputs = {}
+        for step in steps:
+            if step.name in done:
+                outputs[step.name] = done[step.name]
+                continue
+            if self.interrupt is not None and self.interrupt.is_set():
+                raise JobInterrupted(f"Stopped before step '{step.name}'")
+            with span(f"step:{step.name}"):
+                outputs[step.name] = self.run_step(step, outputs)
+            if checkpoints:
+                self.queue.save_checkpoint(self.job_id, step.name, outputs[step.name])
+        return outputs
+
+    def _context(self, step: Step, outputs: dict) -> list:
+        names = step.context if step.context is not None else list(outputs)[-1:]
+        return [outputs[name] for name in names]
+
+    def run_step(self, step: Step, outputs: dict) -> str:
+        context = self._context(step, outputs)
+        description = step.description
+        if step.review is not None:
+            problems = step.review(outputs)
+            if not problems:
+                return context[-1]
+            description += "\n\nFix only these problems and keep everything else as it is:\n" + problems
+        if context:
+            description += "\n\nThis is the context you're working with:\n" + \
+                "\n\n----------\n\n".join(context)
+        key = None
+        if self.results is not None:
+            key = fingerprint(step, description)
+            stored = self.results.get(key)
+            if stored is not None:
+                self._record(step, step.agent, 0.0, dict.fromkeys(USAGE_KEYS, 0), reused=True)
+                return stored
+        text = self._compute(step, description)
+        if key is not None:
+            self.results.set(key, text)
+        return text
+
+    def _compute(self, step: Step, description: str) -> str:
+        started = time.perf_counter()
+        if step.hedge is not None:
+            from app.hedge import race
+
+            def launch(agent, attempt):
+                with llm.attempt(attempt):
+                    return self._kickoff(agent, description, step.expected_output)
+
+            (text, usage, agent), winner, after = race(
+                step.name, launch, step.agent, step.hedge, job_id=self.job_id)
+            self._record(step, agent, time.perf_counter() - started, usage)
+            self.stats[step.name]["hedge"] = {"after_s": round(after, 1), "winner": winner}
+            return text
+        text, usage, agent = self._kickoff(step.agent, description, step.expected_output)
+        self._record(step, agent, time.perf_counter() - started, usage)
+        return text
+
+    def _kickoff(self, agent, description: str, expected_output: str):
+        from crewai import Task, Crew
+
+        share_crew_telemetry()
+        with span("crew.setup"):
+            task = Task(description=description, agent=agent, expected_output=expected_output)
+            # Sampled jobs log every agent step instead of printing it
+            crew = Crew(agents=[agent], tasks=[task],
+                        step_callback=logs.agent_step if logs.verbose() else None)
+        with span("crew.kickoff"):
+            result = crew.kickoff()
+        return str(result), usage_of(crew, result), agent
+
+    def _record(self, step: Step, agent, seconds: float, usage: dict, reused: bool = False):
+        # A step that is redone (e.g. after a duplicate) adds to its totals
+        stats = self.stats.setdefault(step.name, {"seconds": 0.0, "usage": dict.fromkeys(USAGE_KEYS, 0)})
+        stats["seconds"] = round(stats["seconds"] + seconds, 3)
+        stats["reused"] = reused
+        stats["model"] = getattr(getattr(agent, "llm", None), "model_name", None)
+        for key in USAGE_KEYS:
+            stats["usage"][key] += usage[key]
+        log.info("step reused" if reused else "step done",
+                 extra={"step": step.name, "seconds": round(seconds, 3),
+                        "model": stats["model"], "tokens": usage["total_tokens"]})
+
+    def reused(self) -> list:
+        """Steps whose last output came from an earlier run with the same inputs."""
+        return [name for name, stats in self.stats.items() if stats.get("reused")]
+
+    def timings(self) -> dict:
+        return {name: stats["seconds"] for name, stats in self.stats.items()}
+
+    def model(self):
+        """Model of the last step that called one."""
+        models = [stats["model"] for stats in self.stats.values() if stats["model"]]
+        return models[-1] if models else None
+
+    def usage(self) -> dict:
+        """Token usage summed over the steps run in this process."""
+        total = dict.fromkeys(USAGE_KEYS, 0)
+        for stats in self.stats.values():
+            for key in USAGE_KEYS:
+                total[key] += stats["usage"][key]
+        return total
+
+    def discard(self, names):
+        """Forget checkpoints of these steps so the next run redoes them."""
+        if self.job_id:
+            for name in names:
+                self.queue.delete_checkpoint(self.job_id, name)
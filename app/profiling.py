@@ -0,0 +1,213 @@
+"""Opt-in profiling of jobs.
+
+A profiled job records nested spans (job, pipeline steps, crew setup and
+kickoff, every model call and its wait for the rate limiter) and runs a
+sampling profiler over the threads doing its work. The trace is kept in the
+shared state database, so whichever worker ran the job, any worker can serve
+it as Chrome trace JSON (chrome://tracing, Perfetto) or as folded stacks
+(flamegraph.pl, speedscope).
+
+Run with LLM_MODE=fake to see crewai/langchain overhead without network time:
+
+    LLM_MODE=fake FAKE_LLM_LATENCY=0.5 python -m app.profiling "Local Business Automation"
+"""
+import argparse
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from app import settings
+from app.cache import SharedCache
+
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+
+# Spans whose time is spent waiting on the model provider (or our own limiter)
+LLM_SPANS = ("llm.call", "llm.wait")
+
+
+class Trace:
+    """Spans and stack samples of one job, from any number of threads."""
+
+    def __init__(self, job_id: str, interval: float = None):
+        self.job_id = job_id
+        self.interval = settings.PROFILE_INTERVAL if interval is None else interval
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.samples = Counter()
+        self.threads = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _add_thread(self):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            with self._lock:
+                self.threads.add(tid)
+        return tid
+
+    def start_sampler(self):
+        if self.interval > 0:
+            self._sampler = threading.Thread(target=self._sample, name=f"profiler-{self.job_id}",
+                                             daemon=True)
+            self._sampler.start()
+
+    def stop_sampler(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self.threads)
+            for tid in threads:
+                frame = frames.get(tid)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def summary(self) -> dict:
+        """Wall time split into model time (calls and limiter waits) and the rest."""
+        job = next((span for span in self.spans if span["name"] == "job"), None)
+        if job is None:
+            return {}
+
+        def union(intervals):
+            total, end = 0.0, None
+            for start, stop in sorted(intervals):
+                if end is None or start > end:
+                    total += stop - start
+                    end = stop
+                elif stop > end:
+                    total += stop - end
+                    end = stop
+            return total
+
+        wall = job["end"] - job["start"]
+        llm = union([(span["start"], span["end"]) for span in self.spans if span["name"] in LLM_SPANS])
+        steps = {}
+        for step in (span for span in self.spans if span["name"].startswith("step:")):
+            inside = [(max(span["start"], step["start"]), min(span["end"], step["end"]))
+                      for span in self.spans if span["name"] in LLM_SPANS
+                      and span["start"] < step["end"] and span["end"] > step["start"]]
+            model = union(inside)
+            steps[step["name"][5:]] = {"seconds": round(step["end"] - step["start"], 4),
+                                       "llm_seconds": round(model, 4),
+                                       "overhead_seconds": round(step["end"] - step["start"] - model, 4)}
+        return {"job_id": self.job_id, "wall_seconds": round(wall, 4), "llm_seconds": round(llm, 4),
+                "overhead_seconds": round(wall - llm, 4),
+                "cpu_seconds": job["args"].get("cpu_seconds"),
+                "llm_calls": sum(1 for span in self.spans if span["name"] == "llm.call"),
+                "samples": sum(self.samples.values()), "steps": steps}
+
+    def to_dict(self) -> dict:
+        """Chrome trace event format, with the summary and samples alongside."""
+        pid = os.getpid()
+        events = [{"name": span["name"], "ph": "X", "pid": pid, "tid": span["tid"],
+                   "ts": round(span["start"] * 1e6, 1), "dur": round((span["end"] - span["start"]) * 1e6, 1),
+                   "args": span["args"]}
+                  for span in self.spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": self.summary(), "samples": dict(self.samples.most_common())}
+
+
+@contextmanager
+def span(name: str, **args):
+    """Time a block as part of the current job's trace (no-op when not profiling)."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    tid = trace._add_thread()
+    token = _parent.set(name)
+    start = time.perf_counter() - trace.origin
+    try:
+        yield
+    finally:
+        end = time.perf_counter() - trace.origin
+        _parent.reset(token)
+        with trace._lock:
+            trace.spans.append({"name": name, "tid": tid, "start": start, "end": end,
+                                "args": dict(args, parent=_parent.get())})
+
+
+def active() -> bool:
+    return _trace.get() is not None
+
+
+class TraceStore:
+    def __init__(self):
+        self.cache = SharedCache("trace", ttl=settings.PROFILE_TTL)
+
+    def save(self, trace: Trace):
+        self.cache.set(trace.job_id, trace.to_dict())
+
+    def get(self, job_id: str):
+        return self.cache.get(job_id)
+
+
+@contextmanager
+def profile(job_id: str, store: TraceStore = None):
+    """Profile everything run inside the block (in this and derived contexts)."""
+    trace = Trace(job_id)
+    token = _trace.set(trace)
+    trace.start_sampler()
+    cpu = time.thread_time()
+    try:
+        with span("job", job_id=job_id):
+            yield trace
+    finally:
+        cpu = time.thread_time() - cpu
+        trace.stop_sampler()
+        _trace.reset(token)
+        # CPU time of the job's own thread (model calls on other threads excluded)
+        job = next(span for span in reversed(trace.spans) if span["name"] == "job")
+        job["args"]["cpu_seconds"] = round(cpu, 4)
+        (store or TraceStore()).save(trace)
+
+
+def folded(trace: dict) -> str:
+    """A stored trace's samples in the folded-stack format."""
+    return "\n".join(f"{stack} {count}" for stack, count in trace.get("samples", {}).items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("headline")
+    parser.add_argument("--out", default="trace.json", help="Chrome trace file to write")
+    parser.add_argument("--folded", help="also write folded stacks here")
+    args = parser.parse_args()
+
+    from app import logs
+    from app.services import BlogService
+
+    logs.setup()
+    job_id = f"profile-{int(time.time())}"
+    with profile(job_id) as trace:
+        BlogService().write_post(args.headline, job_id=job_id)
+    data = trace.to_dict()
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    if args.folded:
+        with open(args.folded, "w", encoding="utf-8") as f:
+            f.write(folded(data))
+    print(json.dumps(data["otherData"], indent=2))
+
+
+if __name__ == "__main__":
+    # The pipeline records spans through app.profiling, not __main__
+    from app.profiling import main
+    main()
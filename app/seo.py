@@ -0,0 +1,285 @@
+"""Local SEO and readability checks for generated HTML or text.
+
+Replaces the mechanical half of the editor/QA agents: the LLM is only asked
+to fix what these checks find.
+
+    python -m app.seo crap/test.html --keyword "E-Bikes" --link https://...
+"""
+import argparse
+import json
+import re
+from dataclasses import dataclass, field, asdict
+from html.parser import HTMLParser
+
+WORD_RE = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)?")
+SENTENCE_END_RE = re.compile(r"[.!?]+(?:\s|$)")
+MARKDOWN_LINK_RE = re.compile(r"\[([^\]]+)\]\((\S+?)\)")
+# URLs written out in the text, as the category integration step often does
+BARE_URL_RE = re.compile(r"https?://[^\s<>()\[\]\"']+")
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$", re.MULTILINE)
+
+META_DESCRIPTION_RANGE = (50, 160)
+KEYWORD_DENSITY_RANGE = (0.5, 3.5)
+# Flesch reading ease: marketing copy usually lands around 30-50, so only
+# really dense text fails; below the target it is reported as a warning.
+MIN_READING_EASE = 20.0
+TARGET_READING_EASE = 40.0
+MAX_SENTENCE_WORDS = 25.0
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass
+class Finding:
+    check: str
+    severity: str
+    message: str
+    detail: dict = field(default_factory=dict)
+
+
+@dataclass
+class SeoReport:
+    metrics: dict
+    findings: list
+    checks: int
+
+    @property
+    def errors(self) -> list:
+        return [finding for finding in self.findings if finding.severity == ERROR]
+
+    @property
+    def passed(self) -> bool:
+        return not self.errors
+
+    @property
+    def score(self) -> int:
+        """Share of checks without an error, 0-100."""
+        if not self.checks:
+            return 100
+        return round(100 * (self.checks - len(self.errors)) / self.checks)
+
+    def to_prompt(self) -> str:
+        """The failed checks as a short list to hand to an LLM."""
+        return "\n".join(f"- {finding.message}" for finding in self.errors)
+
+    def to_dict(self) -> dict:
+        return {"passed": self.passed, "score": self.score, "metrics": self.metrics,
+                "findings": [asdict(finding) for finding in self.findings]}
+
+
+class _Document(HTMLParser):
+    """Collects text, headings, links and meta tags in one pass."""
+
+    SKIP = {"script", "style", "head", "title"}
+    BLOCK = {"p", "div", "section", "article", "li", "br", "h1", "h2", "h3", "h4", "h5", "h6",
+             "header", "footer", "ul", "ol", "table", "tr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.headings = []
+        self.links = []
+        self.meta = {}
+        self.title = ""
+        self.is_html = False
+        self._skip = 0
+        self._heading = None
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        self.is_html = True
+        attrs = dict(attrs)
+        if tag in self.SKIP:
+            self._skip += 1
+            self._in_title = tag == "title"
+        if tag in self.BLOCK:
+            self.text.append("\n")
+        if re.fullmatch(r"h[1-6]", tag):
+            self._heading = [int(tag[1]), ""]
+        elif tag == "a" and attrs.get("href"):
+            self.links.append(attrs["href"])
+        elif tag == "meta" and attrs.get("name"):
+            self.meta[attrs["name"].lower()] = attrs.get("content") or ""
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP and self._skip:
+            self._skip -= 1
+            self._in_title = False
+        if self._heading and tag == f"h{self._heading[0]}":
+            self.headings.append((self._heading[0], self._heading[1].strip()))
+            self._heading = None
+        if tag in self.BLOCK:
+            self.text.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if self._skip:
+            return
+        if self._heading is not None:
+            self._heading[1] += data
+        self.text.append(data)
+
+
+def _syllables(word: str) -> int:
+    word = word.lower()
+    groups = re.findall(r"[aeiouy]+", word)
+    count = len(groups)
+    if word.endswith("e") and not word.endswith(("le", "ee")) and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def readability(text: str) -> dict:
+    words = WORD_RE.findall(text)
+    sentences = max(1, len([s for s in SENTENCE_END_RE.split(text) if WORD_RE.search(s)]))
+    if not words:
+        return {"sentences": 0, "avg_sentence_words": 0.0, "flesch_reading_ease": 0.0}
+    syllables = sum(_syllables(word) for word in words)
+    words_per_sentence = len(words) / sentences
+    ease = 206.835 - 1.015 * words_per_sentence - 84.6 * (syllables / len(words))
+    return {"sentences": sentences, "avg_sentence_words": round(words_per_sentence, 1),
+            "flesch_reading_ease": round(ease, 1)}
+
+
+def keyword_density(text: str, keyword: str) -> tuple:
+    """(occurrences, density in % of words) for a word or phrase."""
+    words = [word.lower() for word in WORD_RE.findall(text)]
+    phrase = [word.lower() for word in WORD_RE.findall(keyword)]
+    if not words or not phrase:
+        return 0, 0.0
+    n = len(phrase)
+    count = sum(1 for i in range(len(words) - n + 1) if words[i:i + n] == phrase)
+    return count, round(100.0 * count * n / len(words), 2)
+
+
+def _parse(content: str):
+    """(document, visible text, headings, links) for HTML, markdown or text."""
+    doc = _Document()
+    doc.feed(content)
+    doc.close()
+    if doc.is_html:
+        return doc, "".join(doc.text), doc.headings, doc.links
+    text = MARKDOWN_LINK_RE.sub(r"\1", content)
+    headings = [(len(hashes), title.strip()) for hashes, title in MARKDOWN_HEADING_RE.findall(content)]
+    links = [url for _, url in MARKDOWN_LINK_RE.findall(content)]
+    return doc, text, headings, links
+
+
+def plain_text(content: str) -> str:
+    """Visible text of HTML or markdown content."""
+    return _parse(content)[1]
+
+
+def analyze(content: str, keywords=(), expected_links=(), word_range=None,
+            require_meta: bool = False, require_h1: bool = False,
+            density_range=KEYWORD_DENSITY_RANGE) -> SeoReport:
+    """Run the checks that apply to `content` and return a report.
+
+    Only the checks that are asked for are run (readability always is);
+    HTML and markdown headings and links are both understood.
+    """
+    doc, text, headings, links = _parse(content)
+
+    findings = []
+    checks = 0
+    words = len(WORD_RE.findall(text))
+    metrics = {"words": words, "headings": len(headings), "links": len(links)}
+    metrics.update(readability(text))
+
+    if word_range:
+        checks += 1
+        low, high = word_range
+        if not low <= words <= high:
+            findings.append(Finding("word_count", ERROR,
+                                    f"The text has {words} words; it must have {low}-{high}.",
+                                    {"words": words, "min": low, "max": high}))
+
+    if expected_links:
+        checks += 1
+        present = set(links) | {url.rstrip(".,;:!?") for url in BARE_URL_RE.findall(text)}
+        missing = [url for url in expected_links if url not in present]
+        if missing:
+            findings.append(Finding("links", ERROR,
+                                    "These links are missing: " + ", ".join(missing) + ".",
+                                    {"missing": missing}))
+
+    if require_h1:
+        checks += 1
+        levels = [level for level, _ in headings]
+        h1 = levels.count(1)
+        if h1 != 1:
+            findings.append(Finding("headings", ERROR,
+                                    f"The page has {h1} <h1> headings; it must have exactly one.",
+                                    {"h1": h1}))
+        skipped = [(a, b) for a, b in zip(levels, levels[1:]) if b > a + 1]
+        if skipped:
+            findings.append(Finding("headings", ERROR,
+                                    "Heading levels skip a level (e.g. h%d followed by h%d)." % skipped[0],
+                                    {"skips": skipped}))
+
+    if require_meta:
+        checks += 1
+        description = doc.meta.get("description", "").strip()
+        low, high = META_DESCRIPTION_RANGE
+        metrics["meta_description_chars"] = len(description)
+        if not description:
+            findings.append(Finding("meta_description", ERROR, "The meta description is missing."))
+        elif not low <= len(description) <= high:
+            findings.append(Finding("meta_description", ERROR,
+                                    f"The meta description has {len(description)} characters; "
+                                    f"it must have {low}-{high}.",
+                                    {"chars": len(description)}))
+
+    densities = {}
+    for keyword in keywords:
+        checks += 1
+        count, density = keyword_density(text, keyword)
+        densities[keyword] = density
+        low, high = density_range
+        if not low <= density <= high:
+            findings.append(Finding("keyword_density", ERROR,
+                                    f'"{keyword}" appears {count} times ({density}% of words); '
+                                    f"keep it between {low}% and {high}%.",
+                                    {"keyword": keyword, "count": count, "density": density}))
+    if densities:
+        metrics["keyword_density"] = densities
+
+    if words:
+        checks += 1
+        ease = metrics["flesch_reading_ease"]
+        if ease < TARGET_READING_EASE:
+            findings.append(Finding("readability", ERROR if ease < MIN_READING_EASE else WARNING,
+                                    f"Reading ease is {ease} (Flesch); simplify wording to "
+                                    f"reach {TARGET_READING_EASE:g}.",
+                                    {"flesch_reading_ease": ease}))
+        if metrics["avg_sentence_words"] > MAX_SENTENCE_WORDS:
+            findings.append(Finding("sentence_length", WARNING,
+                                    f"Sentences average {metrics['avg_sentence_words']} words.",
+                                    {"avg_sentence_words": metrics["avg_sentence_words"]}))
+
+    return SeoReport(metrics=metrics, findings=findings, checks=checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--keyword", action="append", default=[])
+    parser.add_argument("--link", action="append", default=[])
+    parser.add_argument("--words", help="allowed word count, e.g. 800-1000")
+    parser.add_argument("--meta", action="store_true", help="require a meta description")
+    parser.add_argument("--h1", action="store_true", help="require exactly one h1 and no skipped levels")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        content = f.read()
+    word_range = tuple(int(n) for n in args.words.split("-")) if args.words else None
+    report = analyze(content, args.keyword, args.link, word_range,
+                     require_meta=args.meta, require_h1=args.h1)
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
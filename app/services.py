@@ -1,56 +1,173 @@
-from crewai import Agent, Task, Crew
-from langchain_community.llms import OpenAI
-from app.agents import BlogCreationAgents
+from app.business import for_business, get_profile
+from app.content_store import ContentStore
+from app.dedupe import DuplicateIndex
+from app.hedge import Hedge, HedgeLog
+from app.jobs import JobQueue, JobInterrupted, FAILED
+from app.pipeline import Pipeline, Step
+from app import llm, seo, settings
 from fastapi import HTTPException
 import asyncio
+import time
+
+DUPLICATE_HINT = (
+    "\n\nA previous post on this site is almost identical to the draft you wrote before. "
+    "Take a clearly different angle, structure and set of examples.")
+# Checkpoint recording that a job's draft was already rewritten once
+REWRITTEN = "dedupe:rewritten"
 
 
 class BlogService:
     def __init__(self):
 
         self.llm = ""
+        self.jobs = JobQueue()
+        self.store = ContentStore()
+        self.duplicates = DuplicateIndex()
+        self.hedge_log = HedgeLog()
 
     async def test():
         return {"test": "test"}
 
-    async def generate_blog_post(self, headline: str):
+    async def generate_blog_post(self, headline: str, abort: asyncio.Event = None,
+                                 profile: bool = False):
+        # A recent post for the same headline is served as is (unless the
+        # caller wants a profile of a real run)
+        stored = None if profile else await asyncio.to_thread(
+            self.store.latest, "blog_post", headline, settings.RESULT_CACHE_TTL)
+        if stored is not None:
+            return {"results": stored["body"], "post_id": stored["id"],
+                    "seo": self.seo_report(headline, stored["body"]),
+                    "duplicates": await asyncio.to_thread(self.find_duplicates, headline, stored["body"])}
+        # Any worker process may run the crew; this one only waits for it
+        job_id = await asyncio.to_thread(
+            self.jobs.enqueue, "blog_post", {"headline": headline, "profile": profile},
+            # A profiled run must not be merged into an unprofiled one (or
+            # the other way round): only the profiled job has a trace
+            dedupe_key=f"blog_post:{headline}" + (":profile" if profile else ""))
+        try:
+            job = await self.jobs.wait(job_id, abort=abort)
+        except JobInterrupted:
+            # This worker is shutting down; the job resumes elsewhere
+            raise HTTPException(
+                status_code=503, detail=f"Service restarting, job {job_id} will resume.")
+        except asyncio.CancelledError:
+            raise HTTPException(
+                status_code=503, detail="Service unavailable due to task cancellation.")
+        except TimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        if job["status"] == FAILED:
+            if job["error"].startswith(llm.UNAVAILABLE):
+                # Finished steps are kept; the next request resumes the job
+                raise HTTPException(status_code=503, detail=job["error"],
+                                    headers={"Retry-After": str(int(settings.LLM_BREAKER_RESET))})
+            raise HTTPException(status_code=500, detail=job["error"])
+        post_id = await asyncio.to_thread(self.store_id, job_id)
+        response = {"results": job["result"], "post_id": post_id, "job_id": job_id,
+                    "seo": self.seo_report(headline, job["result"]),
+                    "duplicates": await asyncio.to_thread(self.find_duplicates, headline, job["result"])}
+        if profile:
+            response["trace"] = f"/jobs/{job_id}/trace"
+        return response
+
+    def store_id(self, job_id: str):
+        posts = self.store.list(kind="blog_post", job_id=job_id, limit=1)
+        return posts[0]["id"] if posts else None
+
+    def find_duplicates(self, headline: str, text: str) -> list:
+        """Other stored posts that are near-duplicates of `text`."""
+        return self.duplicates.find_similar(text, exclude=(f"blog_post:{headline}",))
+
+    def seo_report(self, headline: str, html: str) -> dict:
+        return seo.analyze(html, keywords=[headline], require_meta=True,
+                           require_h1=True).to_dict()
+
+    def review_draft(self, headline: str, draft: str) -> str:
+        """Mechanical problems in the draft, for the editor to fix (if any)."""
+        return seo.analyze(draft, keywords=[headline], word_range=(800, 1000)).to_prompt()
+
+    def writer_hedge(self, headline: str):
+        """A second draft for slow writing steps, if HEDGE_WRITER is on."""
+        if not settings.HEDGE_WRITER:
+            return None
+        from app.agents import BlogCreationAgents
+
+        agents = BlogCreationAgents(model_name=settings.HEDGE_MODEL) if settings.HEDGE_MODEL \
+            else BlogCreationAgents()
+        return Hedge(agents.writer_agent(), log=self.hedge_log,
+                     validate=lambda draft: self.review_draft(headline, draft))
+
+    def write_post(self, headline: str, job_id: str = None, interrupt=None):
+        """Run the crew for `headline`. Called by the job workers.
+
+        Each step's output is checkpointed under `job_id`, so a job that was
+        interrupted by a deploy picks up after its last finished step.
+        """
+        from app.agents import BlogCreationAgents
+
+        started = time.perf_counter()
+        business = get_profile(settings.BUSINESS_URL) if settings.BUSINESS_URL else None
         researcher_agent = BlogCreationAgents().researcher_agent()
         writer_agent = BlogCreationAgents().writer_agent()
         editor_agent = BlogCreationAgents().editor_agent()
         seo_optimizer_agent = BlogCreationAgents().website_integrator_agent()
 
-        research_task = Task(
-            description=f'Research key points for the blog post: "{headline}"',
+        research_task = Step(
+            "research",
+            description=f'Research key points for the blog post: "{headline}"' +
+            for_business(business, "name", "offerings", "audience"),
             agent=researcher_agent,
             expected_output="A list of key points and statistics relevant to the headline topic."
         )
 
-        writing_task = Task(
-            description=f'Write a 800-1000 word blog post for the headline: "{headline}"',
+        writing_task = Step(
+            "writing",
+            description=f'Write a 800-1000 word blog post for the headline: "{headline}"' +
+            for_business(business, "audience", "tone"),
             agent=writer_agent,
-            expected_output="A complete 800-1000 word blog post addressing the headline topic."
+            expected_output="A complete 800-1000 word blog post addressing the headline topic.",
+            hedge=self.writer_hedge(headline)
         )
 
-        editing_task = Task(
+        editing_task = Step(
+            "editing",
             description=f'Edit and optimize the blog post for "{headline}"',
             agent=editor_agent,
-            expected_output="An edited and SEO-optimized version of the blog post."
+            expected_output="An edited and SEO-optimized version of the blog post.",
+            # Only called when the local checks find something to fix
+            review=lambda outputs: self.review_draft(headline, outputs["writing"])
         )
 
-        seo_task = Task(
+        seo_task = Step(
+            "seo",
             description=f'Wrap the blog post "{headline}" in SEO-optimized HTML format',
             agent=seo_optimizer_agent,
             expected_output="The blog post wrapped in HTML with appropriate meta tags, header structure, and schema markup."
         )
-        crew = Crew(
-            agents=[researcher_agent],
-            tasks=[research_task]
-        )
-        try:
-            results = crew.kickoff()
-            return {"results": results}
-        except asyncio.CancelledError:
-            raise HTTPException(
-                status_code=503, detail="Service unavailable due to task cancellation.")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+        pipeline = Pipeline(job_id=job_id, queue=self.jobs, interrupt=interrupt)
+        steps = [research_task, writing_task, editing_task, seo_task]
+        # A resumed job whose draft was already rewritten keeps (or finishes)
+        # that rewrite instead of checking it again
+        rewritten = job_id is not None and REWRITTEN in self.jobs.checkpoints(job_id)
+        if rewritten:
+            writing_task.description += DUPLICATE_HINT
+        outputs = pipeline.run(steps[:2])
+        # Check the draft against every stored post before paying for the
+        # editing and HTML steps; a duplicate gets one rewrite
+        if (settings.DEDUPE_ACTION == "regenerate" and not rewritten
+                and self.find_duplicates(headline, outputs["writing"])):
+            pipeline.discard(["writing"])
+            if job_id is not None:
+                self.jobs.save_checkpoint(job_id, REWRITTEN, True)
+            writing_task.description += DUPLICATE_HINT
+            outputs = pipeline.run(steps[:2], done={"research": outputs["research"]})
+        outputs = pipeline.run(steps, done=outputs)
+        results = outputs["seo"]
+        self.duplicates.add(f"blog_post:{headline}", results, kind="blog_post")
+        inputs = {"headline": headline}
+        if business is not None:
+            inputs["business"] = business.ref()
+        self.store.add("blog_post", headline, results, inputs=inputs,
+                       model=pipeline.model(), usage=pipeline.usage(),
+                       duration_s=round(time.perf_counter() - started, 3),
+                       timings=pipeline.timings(), job_id=job_id)
+        return results
@@ -0,0 +1,115 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Shared state (job queue, caches) lives in one SQLite file so every worker
+# process on the instance sees the same data.
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.getcwd(), "data"))
+STATE_DB = os.getenv("STATE_DB", os.path.join(DATA_DIR, "state.sqlite3"))
+# Generated posts (compressed bodies + full-text index)
+CONTENT_DB = os.getenv("CONTENT_DB", os.path.join(DATA_DIR, "content.sqlite3"))
+
+# Jobs
+JOB_CONSUMER = os.getenv("JOB_CONSUMER", "1") == "1"
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "900"))
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+# Worker processes are replaced after this many jobs or above this RSS
+# (0 = never); in-flight jobs are drained or resumed elsewhere first
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "500"))
+WORKER_MAX_RSS_MB = float(os.getenv("WORKER_MAX_RSS_MB", "1024"))
+
+# Caches; a stored post younger than RESULT_CACHE_TTL is re-served as is
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 86400)))
+# Step outputs of incremental pipelines, by hash of their inputs (0 = kept
+# until the inputs change)
+STEP_RESULT_TTL = float(os.getenv("STEP_RESULT_TTL", "0"))
+# Web tool results (file tool results live until the file changes)
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "3600"))
+
+# Near-duplicate detection (estimated Jaccard similarity of word shingles)
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+# "regenerate" retries a duplicate draft once with a different angle, "flag"
+# only reports it
+DEDUPE_ACTION = os.getenv("DEDUPE_ACTION", "regenerate")
+
+# LLM
+# "openai" talks to the API, "fake" returns canned answers so the service can
+# be exercised and load tested without spending tokens.
+LLM_MODE = os.getenv("LLM_MODE", "openai")
+# Per-process limits on calls to the provider (0 = no requests-per-minute cap)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+# Share of fake calls that fail with a timeout, to exercise the retry path
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+# Per-call timeout, retries of transient errors (jittered exponential backoff
+# from LLM_RETRY_BASE up to LLM_RETRY_MAX seconds) and the circuit breaker:
+# LLM_BREAKER_FAILURES errors in a row fail calls fast for LLM_BREAKER_RESET
+# seconds. LLM_FALLBACK_MODEL, if set, answers when the model is unavailable.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "3"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "1"))
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+
+# Posts optimised at once by python -m app.keywords
+KEYWORD_CONCURRENCY = int(os.getenv("KEYWORD_CONCURRENCY", "4"))
+# Job postings processed at once by python -m app.applications, and how much
+# of each posting's text is sent to the model
+APPLICATION_CONCURRENCY = int(os.getenv("APPLICATION_CONCURRENCY", "8"))
+POSTING_CHARS = int(os.getenv("POSTING_CHARS", "6000"))
+
+# Business profile (python -m app.business) used by the blog pipeline when
+# BUSINESS_URL is set. Profiles are re-checked after BUSINESS_PROFILE_TTL
+# seconds by crawling up to BUSINESS_CRAWL_PAGES pages of the site again.
+BUSINESS_URL = os.getenv("BUSINESS_URL", "")
+BUSINESS_PROFILE_TTL = float(os.getenv("BUSINESS_PROFILE_TTL", str(7 * 86400)))
+BUSINESS_CRAWL_PAGES = int(os.getenv("BUSINESS_CRAWL_PAGES", "4"))
+BUSINESS_CRAWL_CHARS = int(os.getenv("BUSINESS_CRAWL_CHARS", "12000"))
+
+# Hedged writing: when the blog draft takes longer than the HEDGE_QUANTILE of
+# recent drafts, a second one is started (on HEDGE_MODEL if set) and the
+# first that passes the local checks wins. Until HEDGE_MIN_SAMPLES drafts
+# have been timed, HEDGE_AFTER seconds is used as the threshold.
+HEDGE_WRITER = os.getenv("HEDGE_WRITER", "0") == "1"
+HEDGE_MODEL = os.getenv("HEDGE_MODEL", "")
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.9"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_AFTER = float(os.getenv("HEDGE_AFTER", "90"))
+
+# Profiling: PROFILE_JOBS=1 profiles every job (otherwise only those asked
+# for with /first?profile=true). Stacks are sampled every PROFILE_INTERVAL
+# seconds (0 = spans only) and traces are kept for PROFILE_TTL seconds.
+PROFILE_JOBS = os.getenv("PROFILE_JOBS", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_TTL = float(os.getenv("PROFILE_TTL", "86400"))
+
+# Logging: JSON lines written by a background thread (to LOG_FILE, or stderr
+# when empty) from a queue of at most LOG_QUEUE_SIZE records. LOG_LEVELS sets
+# levels per component, e.g. "app.llm=DEBUG,crewai=WARNING". Agent thoughts
+# and tool calls are logged for a LOG_TRACE_SAMPLE share of jobs, each field
+# cut to LOG_TRACE_CHARS characters.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,openai=WARNING")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_TRACE_SAMPLE = float(os.getenv("LOG_TRACE_SAMPLE", "0.01"))
+LOG_TRACE_CHARS = int(os.getenv("LOG_TRACE_CHARS", "4000"))
+
+# Memory: RSS of every job (sampled every MEMORY_SAMPLE_INTERVAL seconds),
+# plus the Python heap and its biggest growth sites with MEMORY_TRACEMALLOC=1.
+# Tool results longer than TOOL_OUTPUT_CHARS are spilled to DATA_DIR/spill
+# (files older than SPILL_TTL seconds are removed when a worker starts).
+MEMORY_TRACKING = os.getenv("MEMORY_TRACKING", "1") == "1"
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", "0.5"))
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "0") == "1"
+TOOL_OUTPUT_CHARS = int(os.getenv("TOOL_OUTPUT_CHARS", "200000"))
+SPILL_TTL = float(os.getenv("SPILL_TTL", "86400"))
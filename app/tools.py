@@ -0,0 +1,174 @@
+"""Web and file readers, with results cached across runs and worker processes.
+
+crewai's `cache=True` only reuses a tool result inside one crew. Here every
+call is keyed by tool name and arguments in the shared state database:
+results of file tools stay valid while the file is unchanged (mtime and
+size, then a content hash), web tools expire after `TOOL_CACHE_TTL`.
+Results longer than `TOOL_OUTPUT_CHARS` (raw HTML, long documents) are cut
+and spilled to a file before they are returned or cached (see app.memory).
+The pipelines that read pages and documents (app.business, app.applications)
+call them directly instead of handing them to an agent.
+
+    python -m app.tools          # hit rates per tool
+"""
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+
+from app import db, memory, settings
+from app.cache import SharedCache, make_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_stats (
+    tool TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    seconds_saved REAL NOT NULL DEFAULT 0
+);
+"""
+
+FILE = "file"
+WEB = "web"
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ToolCache:
+    """Shared cache of tool results with per-tool hit/miss counters."""
+
+    def __init__(self, ttl: float = None, path: str = None):
+        self.ttl = settings.TOOL_CACHE_TTL if ttl is None else ttl
+        self.path = path or settings.STATE_DB
+        self.results = SharedCache("tool", path=self.path)
+        db.ensure_schema(self.path, SCHEMA)
+
+    def _count(self, tool: str, hit: bool, seconds: float = 0.0):
+        db.connect(self.path).execute(
+            "INSERT INTO tool_stats (tool, hits, misses, seconds_saved) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (tool) DO UPDATE SET hits = hits + excluded.hits, "
+            "misses = misses + excluded.misses, seconds_saved = seconds_saved + excluded.seconds_saved",
+            (tool, int(hit), int(not hit), seconds if hit else 0.0))
+
+    def _fresh(self, entry: dict, file_path: str):
+        """Whether a cached file-tool result still matches the file on disk."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return True
+        # Touched but maybe not changed (checkout, copy): compare contents
+        if entry["size"] == stat.st_size and entry["sha256"] == _file_hash(file_path):
+            entry["mtime_ns"] = stat.st_mtime_ns
+            return True
+        return False
+
+    def call(self, tool: str, fn, args: dict, kind: str = WEB, file_path: str = None):
+        """`fn()` for `tool` called with `args`, from the cache when valid."""
+        key = make_key(tool, args)
+        entry = self.results.get(key)
+        if entry is not None:
+            mtime_ns = entry.get("mtime_ns")
+            if kind != FILE or self._fresh(entry, file_path):
+                if entry.get("mtime_ns") != mtime_ns:
+                    self.results.set(key, entry, ttl=0)
+                self._count(tool, True, entry["seconds"])
+                return entry["value"]
+
+        started = time.perf_counter()
+        if kind == FILE:
+            # Stat before reading, so a write during the call invalidates it
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # Let the tool report the missing file; nothing to cache
+                return fn()
+        value = fn()
+        entry = {"value": value, "seconds": round(time.perf_counter() - started, 4)}
+        if kind == FILE:
+            entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=_file_hash(file_path))
+            self.results.set(key, entry, ttl=0)
+        else:
+            self.results.set(key, entry, ttl=self.ttl)
+        self._count(tool, False)
+        return value
+
+    def stats(self) -> dict:
+        rows = db.connect(self.path).execute(
+            "SELECT tool, hits, misses, seconds_saved FROM tool_stats ORDER BY tool").fetchall()
+        return {row["tool"]: {"hits": row["hits"], "misses": row["misses"],
+                              "hit_rate": round(row["hits"] / ((row["hits"] + row["misses"]) or 1), 3),
+                              "seconds_saved": round(row["seconds_saved"], 2)}
+                for row in rows}
+
+    def reset_stats(self):
+        db.connect(self.path).execute("DELETE FROM tool_stats")
+
+
+tool_cache = ToolCache()
+
+
+def cached_tool(kind: str = WEB, path_arg: str = None, name: str = None):
+    """Cache a plain tool function, with its result bounded by `memory.bounded`.
+
+    `path_arg` names the file argument of file tools.
+    """
+    def decorate(fn):
+        tool = name or fn.__name__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = dict(signature.bind(*args, **kwargs).arguments)
+            file_path = os.path.abspath(bound[path_arg]) if path_arg else None
+            if file_path:
+                bound[path_arg] = file_path
+            return tool_cache.call(tool, lambda: memory.bounded(fn(*args, **kwargs)), bound, kind,
+                                   file_path)
+        return wrapper
+    return decorate
+
+
+@cached_tool(WEB, name="get_webpage_contents")
+def fetch_webpage(url: str) -> str:
+    import requests
+
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()  # Check for HTTP errors
+    return response.text
+
+
+# Not keyed "fetch_pdf_content": results cached under that name hold only page one
+@cached_tool(FILE, path_arg="pdf_path", name="fetch_pdf_pages")
+def fetch_pdf_content(pdf_path: str) -> str:
+    """
+    Reads a local PDF and returns the content
+    """
+    from langchain_community.document_loaders import PyMuPDFLoader
+
+    loader = PyMuPDFLoader(pdf_path)
+    return "\n\n".join(page.page_content for page in loader.load())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="zero the counters")
+    args = parser.parse_args()
+    if args.reset:
+        tool_cache.reset_stats()
+    print(json.dumps(tool_cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import importlib
+import threading
+import time
+
+from app.llm import install_llm_cache
+
+# Heavy modules that the first job would otherwise import on the request path
+PREWARM_MODULES = [
+    "langchain_core",
+    "langchain_openai",
+    "crewai",
+    "app.agents",
+]
+
+
+class Warmup:
+    """Imports the heavy dependencies in a background thread after startup.
+
+    The server answers health probes immediately; `/ready` only reports ready
+    once this has finished.
+    """
+
+    def __init__(self, modules=None):
+        self.modules = modules or PREWARM_MODULES
+        self.status = "pending"
+        self.error = None
+        self.timings = {}
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self):
+        if self._thread is None:
+            self.status = "warming"
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        try:
+            for name in self.modules:
+                started = time.perf_counter()
+                importlib.import_module(name)
+                self.timings[name] = round(time.perf_counter() - started, 3)
+            install_llm_cache()
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        else:
+            self.status = "ready"
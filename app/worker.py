@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from contextlib import nullcontext
+
+from app import logs, memory, profiling, settings
+from app.jobs import JobQueue, JobInterrupted
+from app.llm import install_llm_cache
+from app.services import BlogService
+
+
+def _blog_post(job, interrupt):
+    return BlogService().write_post(job["payload"]["headline"], job_id=job["id"],
+                                    interrupt=interrupt)
+
+
+log = logging.getLogger(__name__)
+
+HANDLERS = {
+    "blog_post": _blog_post,
+}
+
+
+def _run(job, interrupt):
+    handler = HANDLERS[job["kind"]]
+    with logs.job(job["id"], verbose=job["payload"].get("verbose")):
+        log.info("job started", extra={"kind": job["kind"], "attempt": job["attempts"]})
+        started = time.perf_counter()
+        try:
+            with memory.track(job["id"]) if settings.MEMORY_TRACKING else nullcontext():
+                if settings.PROFILE_JOBS or job["payload"].get("profile"):
+                    with profiling.profile(job["id"]):
+                        result = handler(job, interrupt)
+                else:
+                    result = handler(job, interrupt)
+        except JobInterrupted:
+            log.info("job interrupted", extra={"seconds": round(time.perf_counter() - started, 3)})
+            raise
+        except Exception:
+            log.exception("job failed", extra={"seconds": round(time.perf_counter() - started, 3)})
+            raise
+        log.info("job done", extra={"seconds": round(time.perf_counter() - started, 3)})
+        return result
+
+
+class JobWorker:
+    """Claims jobs from the shared queue and runs them in threads.
+
+    One runs inside every web worker (see app.main) unless JOB_CONSUMER=0,
+    and `python -m app.worker` runs a pool of them without the HTTP server.
+
+    After WORKER_MAX_JOBS jobs (give or take 10%, so siblings do not all
+    restart together) or once RSS passes WORKER_MAX_RSS_MB, the worker
+    calls `on_recycle`, by default SIGTERM to its own process: it drains like
+    on a deploy, and gunicorn or the app.worker supervisor starts a fresh
+    process in its place.
+    """
+
+    def __init__(self, queue: JobQueue = None, concurrency: int = None, on_recycle=None):
+        self.queue = queue or JobQueue()
+        self.concurrency = concurrency or settings.JOB_CONCURRENCY
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs_done = 0
+        self.max_jobs = round(settings.WORKER_MAX_JOBS * random.uniform(0.9, 1.1))
+        self.recycling = False
+        self.on_recycle = on_recycle or (lambda: os.kill(os.getpid(), signal.SIGTERM))
+        self._inflight = {}
+        self._stopping = asyncio.Event()
+        # Set once in-flight jobs have finished or been handed back
+        self.drained = asyncio.Event()
+        self._drain_task = None
+
+    async def run(self):
+        memory.start_tracing()
+        await asyncio.to_thread(memory.clean_spills)
+        while not self._stopping.is_set():
+            if len(self._inflight) >= self.concurrency:
+                await asyncio.wait([task for task, _, _ in self._inflight.values()],
+                                   timeout=settings.JOB_POLL_INTERVAL,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                continue
+            job = await asyncio.to_thread(self.queue.claim, self.name)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            interrupt = threading.Event()
+            task = asyncio.create_task(self._execute(job, interrupt))
+            self._inflight[job["id"]] = (task, job, interrupt)
+            task.add_done_callback(lambda _, job_id=job["id"]: self._inflight.pop(job_id, None))
+
+    async def _heartbeat(self, job):
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            await asyncio.to_thread(self.queue.heartbeat, job["id"], job["owner"])
+
+    @property
+    def draining(self) -> bool:
+        return self._stopping.is_set()
+
+    async def _execute(self, job, interrupt):
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await asyncio.to_thread(_run, job, interrupt)
+        except asyncio.CancelledError:
+            raise
+        except JobInterrupted:
+            await asyncio.to_thread(self.queue.release, job["id"], job["owner"])
+        except Exception as e:
+            await asyncio.to_thread(self.queue.fail, job["id"], job["owner"], str(e))
+        else:
+            await asyncio.to_thread(self.queue.complete, job["id"], job["owner"], result)
+        finally:
+            heartbeat.cancel()
+        self.jobs_done += 1
+        self._check_recycle()
+
+    def _check_recycle(self):
+        if self.recycling or self.draining:
+            return
+        rss = memory.rss_mb()
+        if self.max_jobs and self.jobs_done >= self.max_jobs:
+            reason = "job count"
+        elif settings.WORKER_MAX_RSS_MB and rss > settings.WORKER_MAX_RSS_MB:
+            reason = "memory"
+        else:
+            return
+        self.recycling = True
+        log.warning("recycling worker", extra={"reason": reason, "jobs_done": self.jobs_done,
+                                                "rss_mb": round(rss, 1)})
+        self.on_recycle()
+
+    def memory_stats(self) -> dict:
+        return {"pid": os.getpid(), "rss_mb": round(memory.rss_mb(), 1), "jobs_done": self.jobs_done,
+                "max_jobs": self.max_jobs, "max_rss_mb": settings.WORKER_MAX_RSS_MB,
+                "recycling": self.recycling}
+
+    def begin_drain(self):
+        """Start draining without waiting for it (safe to call repeatedly)."""
+        if self._drain_task is None:
+            self._drain_task = asyncio.ensure_future(self._drain(settings.SHUTDOWN_GRACE_SECONDS))
+        return self._drain_task
+
+    async def drain(self, grace: float = None):
+        """Stop claiming, let in-flight jobs finish, then requeue the rest."""
+        if self._drain_task is None:
+            self._drain_task = asyncio.ensure_future(
+                self._drain(settings.SHUTDOWN_GRACE_SECONDS if grace is None else grace))
+        await self._drain_task
+
+    async def _drain(self, grace: float):
+        self._stopping.set()
+        tasks = [task for task, _, _ in self._inflight.values()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=grace)
+        for job_id, (task, job, interrupt) in list(self._inflight.items()):
+            # Only this worker's claims are touched, so draining one process
+            # never disturbs jobs owned by its siblings. The step that is
+            # running keeps going until the process exits and its checkpoint
+            # is still saved; whoever claims the job next resumes from there.
+            interrupt.set()
+            await asyncio.to_thread(self.queue.release, job_id, job["owner"])
+            task.cancel()
+        self.drained.set()
+
+    def install_signal_hooks(self):
+        """Begin draining as soon as the server is told to stop.
+
+        uvicorn only runs the lifespan shutdown after every open request has
+        finished, and /first requests wait on jobs, so waiting for the
+        shutdown event would keep claiming new work until the very end.
+        Hosts that run the lifespan off the main thread (TestClient) keep
+        their own signal handling; the lifespan shutdown still drains.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain)
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(sig, handler)
+
+
+async def serve():
+    install_llm_cache()
+    worker = JobWorker()
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    runner = asyncio.create_task(worker.run())
+    await stop.wait()
+    await worker.drain()
+    await runner
+
+
+def _serve_process():
+    logs.setup()
+    asyncio.run(serve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run job workers without the HTTP server.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    recycling = settings.WORKER_MAX_JOBS or settings.WORKER_MAX_RSS_MB
+    if args.processes == 1 and not recycling:
+        _serve_process()
+        return
+
+    def start():
+        process = multiprocessing.Process(target=_serve_process)
+        process.start()
+        return process
+
+    processes = [start() for _ in range(args.processes)]
+    stopping = threading.Event()
+
+    def forward(signum, frame):
+        stopping.set()
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    # A child that exits on its own was recycled; replace it
+    while processes:
+        for process in processes:
+            process.join(timeout=1 / len(processes))
+        alive = [process for process in processes if process.is_alive()]
+        if not stopping.is_set():
+            alive += [start() for _ in range(len(processes) - len(alive))]
+        processes[:] = alive
+
+
+if __name__ == "__main__":
+    # Log as app.worker, and let child processes share the imported module
+    from app.worker import main
+    main()
@@ -0,0 +1,12 @@
+import multiprocessing
+import os
+
+# One uvicorn worker per core; they share the job queue and caches through
+# the SQLite state database (see app/settings.py).
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Leave room for app.main's shutdown drain before the worker is killed
+graceful_timeout = int(float(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))) + 10
+timeout = 120
+keepalive = 5
@@ -0,0 +1,39 @@
+"""Check that crew model calls go through app.llm's wrappers.
+
+    python scripts/check_crew_calls.py
+
+Runs one blog post through the real crewai crew against the fake LLM and
+fails unless its model calls show up in the per-model metrics (retries,
+breaker and fallback), with a fallback when the primary model always fails.
+crewai's executor streams from the model, which used to skip all of that.
+"""
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    os.environ.update(LLM_MODE="fake", FAKE_LLM_LATENCY="0", FAKE_LLM_ERROR_RATE="1",
+                      LLM_FALLBACK_MODEL="gpt-4o-mini", LLM_RETRIES="1", LLM_RETRY_BASE="0",
+                      LLM_CACHE="0", DEDUPE_ACTION="flag", OTEL_SDK_DISABLED="true",
+                      DATA_DIR=tempfile.mkdtemp(prefix="crew-check-"))
+    sys.path.insert(0, ROOT)
+    from app import llm
+    from app.services import BlogService
+
+    BlogService().write_post("Local Business Automation", job_id="crew-check")
+    models = llm.metrics.to_dict()["models"]
+    primary, fallback = models.get("fake", {}), models.get("fake:gpt-4o-mini", {})
+    checks = {"primary calls": primary.get("calls", 0) > 0,
+              "retries": primary.get("retries", 0) > 0,
+              "fallbacks": primary.get("fallbacks", 0) > 0,
+              "fallback calls": fallback.get("successes", 0) > 0}
+    print(json.dumps({"models": models, "checks": checks}, indent=2))
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
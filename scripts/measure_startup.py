@@ -0,0 +1,107 @@
+"""Measure cold start of the service.
+
+    python scripts/measure_startup.py            # import cost only
+    python scripts/measure_startup.py --server   # also boot uvicorn and probe it
+
+Every measurement runs in a fresh interpreter so nothing is already imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+result = {"rss_before_mb": rss_mb()}
+started = time.perf_counter()
+import app.main
+result["import_s"] = time.perf_counter() - started
+result["rss_after_import_mb"] = rss_mb()
+result["heavy_loaded"] = sorted(m for m in ("crewai", "langchain_core", "langchain_openai",
+                                            "langchain_community", "fitz") if m in sys.modules)
+if "--warm" in sys.argv:
+    started = time.perf_counter()
+    app.main.warmup.run()
+    result["warmup_s"] = time.perf_counter() - started
+    result["warmup_status"] = app.main.warmup.status
+    result["rss_after_warmup_mb"] = rss_mb()
+print(json.dumps(result))
+"""
+
+
+def measure_import(warm: bool) -> dict:
+    args = [sys.executable, "-c", PROBE] + (["--warm"] if warm else [])
+    out = subprocess.run(args, cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _get(url: str):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def measure_server(port: int, probes: int) -> dict:
+    env = dict(os.environ, JOB_CONSUMER="0")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    result = {}
+    try:
+        while "healthy_after_s" not in result or "ready_after_s" not in result:
+            if time.perf_counter() - started > 120:
+                raise TimeoutError("server did not become ready within 120s")
+            try:
+                if "healthy_after_s" not in result and _get(base + "/health")[0] == 200:
+                    result["healthy_after_s"] = time.perf_counter() - started
+                if _get(base + "/ready")[0] == 200:
+                    result["ready_after_s"] = time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.05)
+        latencies = [_get(base + "/health")[1] * 1000 for _ in range(probes)]
+        result["health_p50_ms"] = statistics.median(latencies)
+        result["health_max_ms"] = max(latencies)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", action="store_true", help="boot uvicorn and probe /health and /ready")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--probes", type=int, default=50)
+    args = parser.parse_args()
+
+    report = {"import": measure_import(warm=False), "import_and_warmup": measure_import(warm=True)}
+    if args.server:
+        report["server"] = measure_server(args.port, args.probes)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Soak test: run many blog post jobs against the fake LLM and watch RSS.
+
+    python scripts/soak_test.py                   # 10k jobs
+    python scripts/soak_test.py --jobs 1000 --concurrency 8
+
+One JobWorker runs every job in this process, with recycling off, so any
+growth shows up. RSS is sampled as jobs finish. Growth is measured after
+the first --warmup jobs, once imports, caches and connections are in place.
+The script fails if growth exceeds --max-growth-mb.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=500, help="jobs before the baseline sample")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--max-growth-mb", type=float, default=50.0)
+    parser.add_argument("--data-dir", help="state directory (default: a new temporary one)")
+    args = parser.parse_args()
+
+    os.environ.update(LLM_MODE="fake", FAKE_LLM_LATENCY="0", FAKE_LLM_ERROR_RATE="0",
+                      DEDUPE_ACTION="flag", WORKER_MAX_JOBS="0", WORKER_MAX_RSS_MB="0",
+                      LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                      DATA_DIR=args.data_dir or tempfile.mkdtemp(prefix="soak-"))
+    sys.path.insert(0, ROOT)
+    from app import logs
+
+    logs.setup()
+    report = asyncio.run(soak(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+async def soak(args) -> dict:
+    # Imported once the environment above is in place
+    from app import memory
+    from app.jobs import JobQueue
+    from app.worker import JobWorker
+
+    queue = JobQueue()
+    worker = JobWorker(queue, args.concurrency, on_recycle=lambda: None)
+    for i in range(args.jobs):
+        queue.enqueue("blog_post", {"headline": f"Soak test post {i}"}, dedupe_key=f"soak:{i}")
+
+    every = max(1, (args.jobs - args.warmup) // args.samples)
+    samples, baseline = [], None
+    started = time.perf_counter()
+    runner = asyncio.create_task(worker.run())
+    next_sample = args.warmup
+    while worker.jobs_done < args.jobs:
+        await asyncio.sleep(0.2)
+        if worker.jobs_done >= next_sample:
+            rss = round(memory.rss_mb(), 1)
+            baseline = baseline if baseline is not None else rss
+            samples.append({"jobs": worker.jobs_done, "rss_mb": rss,
+                            "seconds": round(time.perf_counter() - started, 1)})
+            print(f"{worker.jobs_done:>7} jobs  {rss:8.1f} MB", file=sys.stderr)
+            next_sample = worker.jobs_done + every
+    await worker.drain()
+    await runner
+
+    final = round(memory.rss_mb(), 1)
+    baseline = final if baseline is None else baseline
+    growth = round(final - baseline, 1)
+    return {"jobs": worker.jobs_done, "seconds": round(time.perf_counter() - started, 1),
+            "baseline_rss_mb": baseline, "final_rss_mb": final, "growth_mb": growth,
+            "peak_rss_mb": max([sample["rss_mb"] for sample in samples] + [final]),
+            "samples": samples, "passed": growth <= args.max_growth_mb}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.settings reads the environment once, on import
+os.environ.update(DATA_DIR=tempfile.mkdtemp(prefix="tests-"), LLM_MODE="fake", LLM_CACHE="0",
+                  FAKE_LLM_LATENCY="0", FAKE_LLM_ERROR_RATE="0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def state_db(tmp_path, monkeypatch):
+    """A fresh shared state database for one test."""
+    from app import settings
+
+    path = str(tmp_path / "state.sqlite3")
+    monkeypatch.setattr(settings, "STATE_DB", path)
+    return path
@@ -0,0 +1,30 @@
+import os
+
+from app import applications
+
+
+def test_tailor_coerces_model_fields(monkeypatch):
+    monkeypatch.setattr(applications, "_ask", lambda prompt, fake: {
+        "company": 3, "title": {"name": "Engineer"}, "cv": ["line"],
+        "cover_letter": None, "score": "87.5"})
+    posting = {"url": "https://jobs.example/1", "title": "Backend Engineer", "text": "Python"}
+    result = applications.tailor({"name": "Ada", "headline": "Engineer", "skills": []}, posting)
+    assert result["company"] == "3" and result["title"] == "{'name': 'Engineer'}"
+    assert result["cv"] == "['line']" and result["cover_letter"] == ""
+    assert result["score"] == 87
+
+
+def test_write_accepts_non_string_fields(tmp_path):
+    path = applications._write(str(tmp_path), 1, {"company": 42, "title": None, "cv": "# CV",
+                                                  "cover_letter": 7})
+    assert os.path.basename(path) == "01-42"
+    with open(os.path.join(path, "cover_letter.txt"), encoding="utf-8") as f:
+        assert f.read() == "7"
+
+
+def test_posting_text_drops_short_fragments():
+    page = ("<html><head><title> Data  Engineer </title></head><body><nav>Home</nav>"
+            "<p>We are looking for a data engineer with Python and SQL.</p></body></html>")
+    posting = applications.posting_text(page)
+    assert posting["title"] == "Data Engineer"
+    assert "Python and SQL" in posting["text"] and "Home" not in posting["text"]
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from app.content_store import ContentStore, _snippet
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(str(tmp_path / "content.sqlite3"))
+
+
+def test_add_and_get_round_trip(store):
+    body = "<h1>Cargo bikes</h1><p>" + "Carry the kids and the shopping. " * 50 + "</p>"
+    post_id = store.add("blog_post", "Cargo bikes", body, inputs={"headline": "Cargo bikes"},
+                        model="gpt-4o", usage={"total_tokens": 900}, timings={"research": 1.5})
+    post = store.get(post_id)
+    assert post["body"] == body and post["inputs"] == {"headline": "Cargo bikes"}
+    assert post["total_tokens"] == 900 and post["timings"] == {"research": 1.5}
+    assert store.get("missing") is None
+
+
+def test_latest_respects_max_age(store):
+    store.add("blog_post", "Helmets", "first")
+    time.sleep(0.01)
+    store.add("blog_post", "Helmets", "second")
+    assert store.latest("blog_post", "Helmets")["body"] == "second"
+    assert store.latest("category", "Helmets") is None
+    assert store.latest("blog_post", "Helmets", max_age=1e-9) is None
+
+
+def test_list_filters_without_bodies(store):
+    store.add("blog_post", "Locks", "<p>a</p>", category="locks", job_id="j1")
+    store.add("category", "Locks", "<p>b</p>", category="locks")
+    store.add("blog_post", "Helmets", "<p>c</p>", category="helmets")
+    posts = store.list(category="locks")
+    assert {post["kind"] for post in posts} == {"blog_post", "category"}
+    assert all("body" not in post and "inputs" not in post for post in posts)
+    assert [post["headline"] for post in store.list(job_id="j1")] == ["Locks"]
+    assert len(store.list(limit=1, offset=2)) == 1
+    assert store.list(since=time.time() + 60) == []
+
+
+def test_search_ranks_matches_and_cuts_snippets(store):
+    store.add("blog_post", "City bikes", "<p>Ride to work on a light city bike.</p>")
+    store.add("blog_post", "Cargo bikes", "<p>A cargo bike carries the weekly shopping.</p>")
+    results = store.search("shopping")
+    assert [post["headline"] for post in results] == ["Cargo bikes"]
+    assert "shopping" in results[0]["snippet"] and "<p>" not in results[0]["snippet"]
+    assert {post["headline"] for post in store.search("bikes")} == {"City bikes", "Cargo bikes"}
+
+
+def test_delete_removes_from_search(store):
+    post_id = store.add("blog_post", "Locks", "<p>Keep your bike safe with a strong lock.</p>")
+    assert store.delete(post_id)
+    assert not store.delete(post_id)
+    assert store.get(post_id) is None and store.search("lock") == []
+
+
+def test_snippet_centres_on_the_first_match():
+    text = "intro " * 100 + "battery range " + "outro " * 100
+    snippet = _snippet(text, "battery AND range", width=60)
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert "battery range" in snippet and len(snippet) == 66
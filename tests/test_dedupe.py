@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from app import db, dedupe
+from app.dedupe import BANDS, DuplicateIndex
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def text(seed, n=200):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def edited(source, every=60):
+    """The source with one word in every `every` replaced."""
+    words = source.split()
+    return " ".join("changed" if i % every == 0 else word for i, word in enumerate(words))
+
+
+@pytest.fixture
+def index(state_db):
+    return DuplicateIndex(threshold=0.7)
+
+
+def test_signature_estimates_jaccard():
+    a = text(1)
+    assert dedupe.similarity(dedupe.signature(a), dedupe.signature(a)) == 1.0
+    assert dedupe.similarity(dedupe.signature(a), dedupe.signature(edited(a))) > 0.6
+    assert dedupe.similarity(dedupe.signature(a), dedupe.signature(text(2))) < 0.1
+    assert dedupe.shingles("<p>Too short</p>") == {"too short"}
+    assert dedupe.signature("") == [dedupe._MAX_HASH] * dedupe.NUM_PERM
+
+
+def test_finds_near_duplicates_only(index):
+    original = text(1)
+    for seed in range(1, 20):
+        index.add(f"post-{seed}", text(seed))
+    matches = index.find_similar(edited(original))
+    assert [match["doc_id"] for match in matches] == ["post-1"]
+    assert matches[0]["kind"] == "post" and matches[0]["similarity"] >= 0.7
+    assert index.find_similar(text(99)) == []
+    assert index.find_similar(original, exclude=("post-1",)) == []
+
+
+def test_check_and_add_skips_itself(index):
+    assert index.check_and_add("a", text(1)) == []
+    # Storing the same document again is not a duplicate of itself
+    assert index.check_and_add("a", text(1)) == []
+    assert [match["doc_id"] for match in index.check_and_add("b", text(1))] == ["a"]
+
+
+def test_remove(index):
+    index.add("a", text(1))
+    index.remove("a")
+    assert index.find_similar(text(1)) == []
+    assert db.connect(index.path).execute("SELECT COUNT(*) FROM lsh_buckets").fetchone()[0] == 0
+
+
+def test_buckets_from_another_layout_are_rebuilt(index):
+    index.add("a", text(1))
+    # Buckets cut with a different band count are reindexed on start-up
+    with db.transaction(index.path) as conn:
+        conn.execute("INSERT INTO lsh_buckets (bucket, doc_id) VALUES (1, 'a')")
+    reopened = DuplicateIndex(threshold=0.7)
+    count = db.connect(reopened.path).execute("SELECT COUNT(*) FROM lsh_buckets").fetchone()[0]
+    assert count == BANDS
+    assert [match["doc_id"] for match in reopened.find_similar(text(1))] == ["a"]
@@ -0,0 +1,66 @@
+from app.interlinks import InterlinkIndex, tokenize
+
+CATEGORIES = {
+    "city-bikes": ("City Bikes", "Electric city bikes for commuting in town"),
+    "cargo-bikes": ("Cargo Bikes", "Electric cargo bikes for families and deliveries"),
+    "mountain-bikes": ("Mountain Bikes", "Electric mountain bikes for trails"),
+    "helmets": ("Helmets", "Safety helmets for cycling"),
+    "locks": ("Locks", "Strong locks to keep your bike safe in town"),
+}
+
+
+def build():
+    index = InterlinkIndex()
+    for key, (name, description) in CATEGORIES.items():
+        index.upsert(key, name, f"/{key}", description)
+    return index
+
+
+def fresh(index, key, k):
+    """What related() must return, computed without any cached neighbours."""
+    return index._top(index._vectors[key], k, {key})
+
+
+def test_tokenize_folds_plurals_and_drops_stopwords():
+    assert tokenize("The Bikes and a Glass of Helmets") == ["bike", "glass", "helmet"]
+
+
+def test_related_ranks_shared_terms_first():
+    index = build()
+    related = index.related("city-bikes", k=2)
+    assert [item["key"] for item in related] == ["cargo-bikes", "mountain-bikes"]
+    assert related[0]["url"] == "/cargo-bikes" and 0 < related[1]["score"] <= related[0]["score"]
+    assert "cargo-bikes" not in [item["key"] for item in index.related("city-bikes", 2, {"cargo-bikes"})]
+
+
+def test_updates_invalidate_cached_neighbours():
+    index = build()
+    index.related("helmets", k=3)
+    index.related("city-bikes", k=3)
+    index.upsert("helmets", "Bike Helmets", "/helmets", "Helmets for city bikes riders")
+    assert index.related("city-bikes", k=3) == fresh(index, "city-bikes", 3)
+    assert "helmets" in [item["key"] for item in index.related("city-bikes", k=3)]
+    index.remove("cargo-bikes")
+    assert "cargo-bikes" not in index
+    assert index.related("city-bikes", k=3) == fresh(index, "city-bikes", 3)
+
+
+def test_rebuilds_after_many_changes():
+    index = InterlinkIndex(rebuild_ratio=0.2)
+    for i in range(12):
+        index.upsert(f"c{i}", f"Category {i}", description="shared words")
+    # The 11th change rebuilt the weights from all documents seen so far
+    assert index._changes == 1
+    assert index.related("c0", k=1) == fresh(index, "c0", 1)
+
+
+def test_query_and_round_trip(tmp_path):
+    index = build()
+    assert index.query("Which lock keeps my bike safe?", k=1)[0]["key"] == "locks"
+    path = tmp_path / "index.json"
+    index.save(str(path))
+    loaded = InterlinkIndex.load(str(path))
+    assert len(loaded) == len(index)
+    # Loading rebuilds the IDF weights, which upserts leave frozen
+    index.rebuild()
+    assert loaded.related("city-bikes", 2) == index.related("city-bikes", 2)
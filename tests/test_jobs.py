@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from app.jobs import FAILED, QUEUED, RUNNING, JobInterrupted, JobQueue
+
+
+@pytest.fixture
+def queue(state_db):
+    return JobQueue()
+
+
+def test_claim_takes_the_oldest_job_once(queue):
+    first = queue.enqueue("blog_post", {"headline": "a"})
+    queue.enqueue("blog_post", {"headline": "b"})
+    job = queue.claim("w1")
+    assert job["id"] == first and job["status"] == RUNNING and job["attempts"] == 1
+    assert job["payload"] == {"headline": "a"}
+    assert queue.claim("w2")["id"] != first
+    assert queue.claim("w3") is None
+
+
+def test_dedupe_shares_waiting_work(queue):
+    job_id = queue.enqueue("blog_post", {}, dedupe_key="blog_post:a")
+    assert queue.enqueue("blog_post", {}, dedupe_key="blog_post:a") == job_id
+    assert queue.enqueue("blog_post", {}, dedupe_key="blog_post:b") != job_id
+
+
+def test_failed_job_is_requeued_with_its_checkpoints(queue):
+    job_id = queue.enqueue("blog_post", {}, dedupe_key="k")
+    job = queue.claim("w")
+    queue.save_checkpoint(job_id, "research", "notes")
+    assert queue.fail(job_id, job["owner"], "LLM unavailable")
+    assert queue.enqueue("blog_post", {}, dedupe_key="k") == job_id
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.checkpoints(job_id) == {"research": "notes"}
+
+
+def test_finished_job_is_not_shared(queue):
+    job_id = queue.enqueue("blog_post", {}, dedupe_key="k")
+    job = queue.claim("w")
+    assert queue.complete(job_id, job["owner"], {"html": "<p>"})
+    assert queue.get(job_id)["result"] == {"html": "<p>"}
+    assert queue.enqueue("blog_post", {}, dedupe_key="k") != job_id
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = queue.enqueue("blog_post", {})
+    first = queue.claim("w1", lease=0.05)
+    assert queue.claim("w2") is None
+    time.sleep(0.06)
+    second = queue.claim("w2")
+    assert second["id"] == job_id and second["attempts"] == 2
+    # The first owner lost the job: it can neither extend nor finish it
+    assert not queue.heartbeat(job_id, first["owner"])
+    assert not queue.complete(job_id, first["owner"], "late")
+    assert queue.heartbeat(job_id, second["owner"])
+
+
+def test_heartbeat_keeps_the_lease(queue):
+    queue.enqueue("blog_post", {})
+    job = queue.claim("w1", lease=0.05)
+    time.sleep(0.03)
+    assert queue.heartbeat(job["id"], job["owner"], lease=0.05)
+    time.sleep(0.03)
+    assert queue.claim("w2") is None
+
+
+def test_release_hands_the_job_back(queue):
+    job_id = queue.enqueue("blog_post", {})
+    job = queue.claim("w1")
+    assert queue.release(job_id, job["owner"])
+    assert queue.claim("w2")["id"] == job_id
+
+
+def test_checkpoints(queue):
+    queue.save_checkpoint("j", "research", "notes")
+    queue.save_checkpoint("j", "research", "better notes")
+    queue.save_checkpoint("j", "writing", {"draft": 1})
+    queue.delete_checkpoint("j", "writing")
+    assert queue.checkpoints("j") == {"research": "better notes"}
+    queue.clear_checkpoints("j")
+    assert queue.checkpoints("j") == {}
+
+
+def test_wait(queue):
+    job_id = queue.enqueue("blog_post", {})
+    job = queue.claim("w")
+
+    async def finish_later():
+        await asyncio.sleep(0.05)
+        queue.fail(job_id, job["owner"], "boom")
+
+    async def main():
+        task = asyncio.create_task(finish_later())
+        result = await queue.wait(job_id, timeout=2, interval=0.01)
+        await task
+        return result
+
+    assert asyncio.run(main())["status"] == FAILED
+
+
+def test_wait_timeout_and_abort(queue):
+    job_id = queue.enqueue("blog_post", {})
+    with pytest.raises(TimeoutError):
+        asyncio.run(queue.wait(job_id, timeout=0.02, interval=0.01))
+
+    async def aborted():
+        abort = asyncio.Event()
+        abort.set()
+        await queue.wait(job_id, abort=abort)
+
+    with pytest.raises(JobInterrupted):
+        asyncio.run(aborted())
+
+
+def test_purge_removes_old_finished_jobs(queue):
+    done = queue.enqueue("blog_post", {})
+    job = queue.claim("w")
+    queue.complete(done, job["owner"], "ok")
+    queue.save_checkpoint(done, "research", "notes")
+    waiting = queue.enqueue("blog_post", {})
+    time.sleep(0.01)
+    queue.purge(older_than=0)
+    assert queue.get(done) is None and queue.checkpoints(done) == {}
+    assert queue.get(waiting)["status"] == QUEUED
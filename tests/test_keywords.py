@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from app import keywords
+from app.keywords import AVG_SENTENCE_WORDS, Target, analyze, plan_edits
+
+FILLER = "Riders use these machines every day on busy streets and quiet lanes alike. "
+
+
+def post(paragraphs=6, extra=""):
+    """An HTML post of filler paragraphs, `extra` appended to every one."""
+    return "<h1>Garden</h1>" + "".join(f"<p>{FILLER * 3}{extra}</p>" for _ in range(paragraphs))
+
+
+def counts(content, targets):
+    return {keyword: len(spans) for keyword, spans in analyze(content, targets).occurrences.items()}
+
+
+def test_target_parse():
+    target = Target.parse("poppy seeds=1-2.5")
+    assert (target.keyword, target.words, target.low, target.high, target.goal) == \
+        ("poppy seeds", ("poppy", "seeds"), 1.0, 2.5, 1.75)
+    assert Target.parse(" poppy ").keyword == "poppy"
+
+
+def test_analyze_spans_point_into_the_content():
+    content = "<p>Wild <b>flowers</b> and more wild flowers &amp; flowers.</p>"
+    targets = [Target("wild flowers"), Target("flowers")]
+    analysis = analyze(content, targets)
+    assert counts(content, targets) == {"wild flowers": 2, "flowers": 3}
+    assert [content[start:end] for start, end in analysis.occurrences["flowers"]] == ["flowers"] * 3
+    assert analysis.words == 7 and analysis.density(targets[0]) == 57.14
+
+
+def test_sentences_needed_reaches_the_density():
+    target = Target("poppy", low=1, high=3)
+    needed = keywords.sentences_needed(1000, 0, target, density=1)
+    assert needed == 13
+    assert 100.0 * needed / (1000 + AVG_SENTENCE_WORDS * needed) >= 1
+    assert 100.0 * (needed - 1) / (1000 + AVG_SENTENCE_WORDS * (needed - 1)) < 1
+    assert keywords.sentences_needed(1000, 20, target) == 0
+
+
+def test_sentences_needed_rejects_unreachable_densities():
+    target = Target("poppy", low=6, high=8)
+    assert keywords.max_added_density(target) < 6
+    with pytest.raises(ValueError, match="at most 5.6%"):
+        keywords.sentences_needed(1000, 0, target)
+
+
+def test_contains():
+    wild, flowers = Target("wild flowers"), Target("flowers")
+    assert keywords.contains(wild, flowers) == 1 and keywords.contains(flowers, wild) == 0
+    assert keywords.contains(flowers, flowers) == 1
+
+
+def test_plan_adds_nested_keywords_together():
+    content = post()
+    wild, flowers = Target("wild flowers", 1, 3), Target("flowers", 1, 3)
+    plan = plan_edits(content, [wild, flowers])
+    alone = plan_edits(content, [Target("flowers", 1, 3)])
+    # Sentences about wild flowers also count for flowers
+    assert plan.adds["wild flowers"] > 0
+    assert plan.adds.get("flowers", 0) < alone.adds["flowers"]
+    assert plan.problems == []
+    assert all(1 <= density <= 3 for density in plan.projected.values())
+    assert len(plan.slots) == sum(plan.adds.values())
+
+
+def test_projection_matches_the_planned_counts():
+    content = post(extra="Poppy seeds and poppy petals fill the poppy beds.")
+    poppy, seeds = Target("poppy", 1, 3), Target("poppy seeds", 0.5, 5)
+    plan = plan_edits(content, [poppy, seeds])
+    assert plan.replaces["poppy"] and "poppy seeds" not in plan.replaces
+    # Occurrences inside "poppy seeds" (in range) are never replaced
+    kept = plan.analysis.occurrences["poppy seeds"]
+    assert not any(keywords._overlaps(span, kept) for span in plan.replaces["poppy"])
+    replaced = len(plan.replaces["poppy"])
+    words = plan.analysis.words + AVG_SENTENCE_WORDS * len(plan.slots)
+    expected = round(100.0 * (len(plan.analysis.occurrences["poppy"]) - replaced) / words, 2)
+    assert plan.projected["poppy"] == expected and plan.problems == []
+
+
+def test_verify_reports_capped_slots():
+    content = post(paragraphs=1)
+    plan = plan_edits(content, [Target("flowers", 4, 5)])
+    # One paragraph holds at most three new sentences, not enough for 4%
+    assert len(plan.slots) == keywords.MAX_PER_PARAGRAPH < sum(plan.adds.values())
+    assert plan.problems and plan.problems[0].startswith('"flowers" would end at')
+    assert keywords.verify(plan) == plan.problems
+
+
+def test_apply_plan_lands_the_planned_counts():
+    content = post(extra="Poppy seeds and poppy petals fill the poppy beds.")
+    targets = [Target("poppy", 1, 3), Target("wild flowers", 1, 3), Target("flowers", 1, 3)]
+    plan = plan_edits(content, targets)
+    sentences, synonyms = keywords.parse_reply(keywords._fake_reply(plan), plan)
+    assert len(sentences) == len(plan.slots)
+    new, replaced = keywords.apply_plan(content, plan, sentences, synonyms)
+    assert replaced == {"poppy": len(plan.replaces["poppy"])}
+    words = analyze(new, targets).words
+    for target in targets:
+        # The densities differ only because the fake sentences are shorter than average
+        planned = round(plan.projected[target.keyword] * plan.projected_words / 100.0 / len(target.words))
+        assert counts(new, targets)[target.keyword] == planned
+        assert analyze(new, targets).density(target) >= target.low
+    assert words < plan.projected_words and new.count("<p>") == 6
+
+
+def test_parse_reply_keeps_only_valid_entries():
+    content = post(extra="Poppy seeds and poppy petals fill the poppy beds.")
+    targets = [Target("poppy", 1, 3), Target("flowers", 1, 3)]
+    plan = plan_edits(content, targets)
+    slot = next(number for number, (_, keyword) in enumerate(plan.slots, 1) if keyword == "flowers")
+    reply = json.dumps({
+        "sentences": [{"slot": slot, "sentence": "Bees love flowers."},
+                      {"slot": slot, "sentence": "A second one with flowers."},
+                      {"slot": 0, "sentence": "Out of range flowers."},
+                      {"slot": slot + 1, "sentence": "No keyword at all."},
+                      {"slot": slot + 2, "sentence": "Bees love flowers."},
+                      {"slot": slot + 3, "sentence": "Flowers beside a poppy."}],
+        "synonyms": {"poppy": ["red bloom", "poppy head", "", 3]}})
+    sentences, synonyms = keywords.parse_reply("Here you go: " + reply, plan)
+    assert sentences == {slot: "Bees love flowers."}
+    assert synonyms == {"poppy": ["red bloom"]}
+    assert keywords.parse_reply("not json", plan) == ({}, {"poppy": []})
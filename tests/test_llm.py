@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from app import llm, settings
+from app.llm import (CLOSED, HALF_OPEN, OPEN, AttemptCancelled, CircuitBreaker, LLMUnavailable,
+                     call_resilient, is_transient)
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(llm, "metrics", llm.LLMMetrics())
+    monkeypatch.setattr(settings, "LLM_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE", 0)
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(settings, "LLM_BREAKER_RESET", 0.05)
+
+
+def fail(exc):
+    def call():
+        raise exc
+    return call
+
+
+def test_is_transient():
+    assert is_transient(TimeoutError())
+    assert is_transient(type("RateLimitError", (Exception,), {})())
+    assert not is_transient(ValueError())
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failures=2, reset_after=0.05)
+    breaker.failure()
+    assert breaker.allow() and breaker.state == CLOSED
+    breaker.failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(failures=2, reset_after=0.05)
+    breaker.failure()
+    breaker.failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN and breaker.opened == 2
+
+
+def test_retries_then_fallback(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRIES", 1)
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURES", 5)
+    assert call_resilient("m", fail(TimeoutError()), lambda: "fallback") == "fallback"
+    counts = llm.metrics.to_dict()["models"]["m"]
+    assert (counts["calls"], counts["retries"], counts["fallbacks"]) == (2, 1, 1)
+
+
+def test_unavailable_without_fallback():
+    with pytest.raises(LLMUnavailable):
+        call_resilient("m", fail(TimeoutError()))
+
+
+def test_non_transient_error_passes_through_and_settles_trial():
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            call_resilient("m", fail(TimeoutError()))
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        call_resilient("m", fail(ValueError("bad request")))
+    assert llm.metrics.breaker("m").state == CLOSED
+    assert call_resilient("m", lambda: "ok") == "ok"
+
+
+def test_cancelled_trial_does_not_wedge_breaker():
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            call_resilient("m", fail(TimeoutError()))
+    time.sleep(0.06)
+    with pytest.raises(AttemptCancelled):
+        call_resilient("m", fail(AttemptCancelled("loser")))
+    breaker = llm.metrics.breaker("m")
+    # Neither a success nor a failure, but the next call gets the trial
+    assert breaker.state == HALF_OPEN and breaker.failures == 2
+    assert call_resilient("m", lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+    assert llm.metrics.to_dict()["models"]["m"]["short_circuits"] == 0
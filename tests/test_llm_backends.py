@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from app import llm, llm_backends, settings  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(llm, "metrics", llm.LLMMetrics())
+    monkeypatch.setattr(settings, "LLM_RETRIES", 0)
+    monkeypatch.setattr(settings, "LLM_FALLBACK_MODEL", "gpt-4o-mini")
+
+
+def test_fallback_is_only_built_when_needed(monkeypatch):
+    def unexpected(**kwargs):
+        raise AssertionError("fallback built for a call that succeeded")
+
+    monkeypatch.setattr(llm_backends, "FakeFallbackChatModel", unexpected)
+    assert llm_backends.FakeChatModel(responses=["hello"]).invoke("hi").content == "hello"
+
+
+def test_fallback_answers_when_primary_fails(monkeypatch):
+    monkeypatch.setattr(settings, "FAKE_LLM_ERROR_RATE", 1.0)
+    model = llm_backends.FakeChatModel(responses=["primary"])
+    assert model.invoke("hi").content.startswith("Thought:")
+    assert llm.metrics.to_dict()["models"]["fake"]["fallbacks"] == 1
@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+from app import memory, settings
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+
+
+def test_short_text_is_kept():
+    assert memory.bounded("short", limit=10) == "short"
+    assert memory.bounded(None, limit=10) is None
+
+
+def test_long_text_is_cut_and_spilled():
+    text = "x" * 50
+    cut = memory.bounded(text, limit=10)
+    assert cut.startswith("x" * 10 + "\n\n[Output cut at 10 of 50 characters")
+    path = cut.rsplit(" ", 1)[1].rstrip("]")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == text
+    # Same text, same file
+    assert memory.spill(text) == path
+
+
+def test_clean_spills_removes_old_files():
+    old, new = memory.spill("old"), memory.spill("new")
+    os.utime(old, (time.time() - 100, time.time() - 100))
+    assert memory.clean_spills(max_age=50) == 1
+    assert not os.path.exists(old) and os.path.exists(new)
+
+
+def test_track_records_usage(state_db):
+    with memory.track("job-1", memory.MemoryLog()) as usage:
+        pass
+    assert usage["rss_peak_mb"] >= usage["rss_start_mb"] > 0
+    assert memory.MemoryLog().recent()[0]["job_id"] == "job-1"
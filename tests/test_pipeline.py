@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from app.jobs import JobInterrupted, JobQueue
+from app.pipeline import Pipeline, Step
+
+
+class Agent:
+    role = goal = backstory = "writer"
+
+
+class FakePipeline(Pipeline):
+    """Pipeline whose steps answer with their task text instead of a crew."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.computed = []
+
+    def _compute(self, step, description):
+        self.computed.append(step.name)
+        return f"{step.name}({description.split(chr(10))[0]})"
+
+
+def steps(topic="cats"):
+    return [Step("research", Agent(), f"Research {topic}", "notes"),
+            Step("writing", Agent(), "Write", "post")]
+
+
+def test_checkpoints_resume_a_job(state_db):
+    queue = JobQueue()
+    interrupt = threading.Event()
+    first = FakePipeline(job_id="job", queue=queue, interrupt=interrupt)
+    first.run(steps()[:1])
+    interrupt.set()
+    with pytest.raises(JobInterrupted):
+        first.run(steps())
+    resumed = FakePipeline(job_id="job", queue=queue)
+    outputs = resumed.run(steps())
+    assert resumed.computed == ["writing"]
+    assert outputs["research"] == "research(Research cats)"
+
+
+def test_incremental_reuses_unchanged_steps(state_db):
+    FakePipeline(incremental=True).run(steps())
+    again = FakePipeline(incremental=True)
+    again.run(steps())
+    assert again.computed == [] and sorted(again.reused()) == ["research", "writing"]
+
+
+def test_incremental_job_recomputes_changed_inputs(state_db):
+    queue = JobQueue()
+    # An earlier run of the same job was interrupted after "research"
+    queue.save_checkpoint("category:x", "research", "research(Research cats)")
+    pipeline = FakePipeline(job_id="category:x", queue=queue, incremental=True)
+    outputs = pipeline.run(steps("dogs"))
+    assert pipeline.computed == ["research", "writing"]
+    assert outputs["research"] == "research(Research dogs)"
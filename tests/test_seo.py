@@ -0,0 +1,65 @@
+from app import seo
+
+SENTENCE = "Our e-bikes make the daily ride to work quick and easy for everyone. "
+PAGE = (
+    "<html><head><title>E-Bikes</title>"
+    '<meta name="description" content="City e-bikes with long range batteries, fitted and serviced in our shop.">'
+    "</head><body><h1>E-Bikes for the city</h1><h2>Range in the city</h2>"
+    f"<p>{SENTENCE * 20}</p>"
+    '<p>See <a href="https://shop.example/cargo">cargo bikes</a>.</p></body></html>'
+)
+
+
+def checks(report):
+    return {finding.check for finding in report.errors}
+
+
+def test_clean_page_passes():
+    report = seo.analyze(PAGE, keywords=["city"], expected_links=["https://shop.example/cargo"],
+                         word_range=(100, 400), require_meta=True, require_h1=True)
+    assert report.passed and report.score == 100, report.to_prompt()
+    assert report.metrics["headings"] == 2 and report.metrics["links"] == 1
+
+
+def test_failures_are_reported_for_the_prompt():
+    page = PAGE.replace("<h1>E-Bikes for the city</h1><h2>", "<h2>").replace(
+        'content="City', 'content="Short"  data-x="').replace("</h2>", "</h2><h4>Deep</h4>")
+    report = seo.analyze(page, keywords=["cargo trailer"], expected_links=["https://shop.example/city"],
+                         word_range=(800, 1000), require_meta=True, require_h1=True)
+    assert checks(report) == {"word_count", "links", "headings", "meta_description", "keyword_density"}
+    prompt = report.to_prompt()
+    assert "https://shop.example/city" in prompt and "exactly one" in prompt
+    assert not report.passed and report.score < 50
+
+
+def test_bare_urls_count_as_links():
+    text = f"{SENTENCE * 5}More at https://shop.example/cargo."
+    report = seo.analyze(text, expected_links=["https://shop.example/cargo"])
+    assert "links" not in checks(report)
+
+
+def test_markdown_headings_and_links():
+    text = f"# Title\n\n## Part\n\n{SENTENCE * 3}[cargo](https://shop.example/cargo)"
+    doc, plain, headings, links = seo._parse(text)
+    assert headings == [(1, "Title"), (2, "Part")]
+    assert links == ["https://shop.example/cargo"] and "[cargo]" not in plain
+
+
+def test_keyword_density_counts_phrases():
+    assert seo.keyword_density("Cargo bikes carry more. Cargo bikes are big.", "cargo bikes") == (2, 50.0)
+    assert seo.keyword_density("", "bikes") == (0, 0.0)
+
+
+def test_readability():
+    easy = seo.readability("The cat sat. The dog ran. We had fun.")
+    hard = seo.readability("Notwithstanding considerable organisational heterogeneity, "
+                           "interdepartmental communication necessitates comprehensive standardisation.")
+    assert easy["sentences"] == 3 and easy["flesch_reading_ease"] > hard["flesch_reading_ease"]
+    report = seo.analyze("Notwithstanding considerable organisational heterogeneity, interdepartmental "
+                         "communication necessitates comprehensive standardisation.")
+    assert "readability" in checks(report)
+
+
+def test_plain_text_skips_scripts_and_head():
+    text = seo.plain_text("<head><title>T</title></head><script>var x;</script><p>Hello</p>")
+    assert text.strip() == "Hello"
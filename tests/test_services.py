@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("crewai")
+
+from app import services, settings  # noqa: E402
+from app.services import REWRITTEN, BlogService  # noqa: E402
+
+
+@pytest.fixture
+def service(state_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_DB", str(tmp_path / "content.sqlite3"))
+    monkeypatch.setattr(settings, "DEDUPE_ACTION", "regenerate")
+    monkeypatch.setattr(settings, "BUSINESS_URL", "")
+    monkeypatch.setenv("OTEL_SDK_DISABLED", "true")
+    service = BlogService()
+    service.checked = []
+
+    def always_duplicate(headline, draft):
+        service.checked.append(draft)
+        return [{"doc_id": "blog_post:other", "similarity": 0.95}]
+
+    monkeypatch.setattr(service, "find_duplicates", always_duplicate)
+    return service
+
+
+def test_duplicate_draft_is_rewritten_once(service):
+    service.write_post("Local Business Automation", job_id="job-1")
+    assert len(service.checked) == 1
+    assert service.jobs.checkpoints("job-1")[REWRITTEN] is True
+
+
+def test_resumed_rewrite_is_not_checked_again(service):
+    # Interrupted after the rewrite was decided and the new draft checkpointed
+    service.jobs.save_checkpoint("job-2", "research", "notes")
+    service.jobs.save_checkpoint("job-2", "writing", "rewritten draft")
+    service.jobs.save_checkpoint("job-2", REWRITTEN, True)
+    service.write_post("Local Business Automation", job_id="job-2")
+    assert service.checked == []
+
+
+def test_duplicate_hint_is_used_when_resuming_before_the_rewrite(service, monkeypatch):
+    service.jobs.save_checkpoint("job-3", "research", "notes")
+    service.jobs.save_checkpoint("job-3", REWRITTEN, True)
+    seen = []
+    run_step = services.Pipeline.run_step
+
+    def spy(pipeline, step, outputs):
+        seen.append((step.name, step.description))
+        return run_step(pipeline, step, outputs)
+
+    monkeypatch.setattr(services.Pipeline, "run_step", spy)
+    service.write_post("Local Business Automation", job_id="job-3")
+    writing = [description for name, description in seen if name == "writing"]
+    assert len(writing) == 1 and writing[0].endswith(services.DUPLICATE_HINT)
+    assert service.checked == []
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from app import settings, tools
+from app.tools import FILE, ToolCache, cached_tool
+
+
+@pytest.fixture
+def cache(state_db, monkeypatch):
+    cache = ToolCache(ttl=60)
+    monkeypatch.setattr(tools, "tool_cache", cache)
+    return cache
+
+
+def counting(result):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return result
+    return fn, calls
+
+
+def test_web_results_are_reused(cache):
+    fn, calls = counting("page")
+    assert cache.call("web", fn, {"url": "a"}) == "page"
+    assert cache.call("web", fn, {"url": "a"}) == "page"
+    assert cache.call("web", fn, {"url": "b"}) == "page"
+    assert len(calls) == 2
+    assert cache.stats()["web"]["hits"] == 1
+
+
+def test_file_results_follow_the_file(cache, tmp_path):
+    path = tmp_path / "cv.txt"
+    path.write_text("one")
+    read = lambda: path.read_text()  # noqa: E731
+    assert cache.call("read", read, {"path": str(path)}, FILE, str(path)) == "one"
+    # Touched but unchanged: still a hit
+    os.utime(path, (1, 1))
+    assert cache.call("read", lambda: "unexpected", {"path": str(path)}, FILE, str(path)) == "one"
+    path.write_text("two!")
+    assert cache.call("read", read, {"path": str(path)}, FILE, str(path)) == "two!"
+
+
+def test_cached_tool_bounds_results(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "TOOL_OUTPUT_CHARS", 5)
+
+    @cached_tool(name="big")
+    def big(url):
+        return "0123456789"
+
+    result = big("https://example.com")
+    assert result.startswith("01234\n\n[Output cut at 5 of 10 characters")
+    assert cache.results.get(tools.make_key("big", {"url": "https://example.com"}))["value"] == result
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import settings, worker
+from app.jobs import DONE, FAILED, QUEUED, JobInterrupted, JobQueue
+from app.worker import JobWorker
+
+
+@pytest.fixture
+def queue(state_db, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "MEMORY_TRACKING", False)
+    return JobQueue()
+
+
+def handler(monkeypatch, fn):
+    monkeypatch.setitem(worker.HANDLERS, "test", lambda job, interrupt: fn(job["payload"], interrupt))
+
+
+async def until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_runs_jobs_and_records_results(queue, monkeypatch):
+    def run(payload, interrupt):
+        if payload["n"] == 2:
+            raise ValueError("bad input")
+        return payload["n"] * 10
+
+    handler(monkeypatch, run)
+    ids = [queue.enqueue("test", {"n": n}) for n in range(3)]
+
+    async def main():
+        w = JobWorker(queue, concurrency=2, on_recycle=lambda: None)
+        runner = asyncio.create_task(w.run())
+        await until(lambda: w.jobs_done == 3)
+        await w.drain(grace=1)
+        await runner
+
+    asyncio.run(main())
+    jobs = [queue.get(job_id) for job_id in ids]
+    assert [job["status"] for job in jobs] == [DONE, DONE, FAILED]
+    assert [jobs[0]["result"], jobs[1]["result"]] == [0, 10]
+    assert jobs[2]["error"] == "bad input"
+
+
+def test_drain_hands_slow_jobs_back(queue, monkeypatch):
+    started = threading.Event()
+
+    def run(payload, interrupt):
+        started.set()
+        # A pipeline checks the interrupt between steps
+        interrupt.wait(5)
+        raise JobInterrupted("stopped")
+
+    handler(monkeypatch, run)
+    job_id = queue.enqueue("test", {})
+
+    async def main():
+        w = JobWorker(queue, concurrency=1, on_recycle=lambda: None)
+        runner = asyncio.create_task(w.run())
+        await until(started.is_set)
+        await w.drain(grace=0.05)
+        await runner
+        return w
+
+    w = asyncio.run(main())
+    assert w.drained.is_set()
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED and job["owner"] is None
+
+
+def test_drain_lets_quick_jobs_finish(queue, monkeypatch):
+    started = threading.Event()
+
+    def run(payload, interrupt):
+        started.set()
+        time.sleep(0.05)
+        return "ok"
+
+    handler(monkeypatch, run)
+    job_id = queue.enqueue("test", {})
+
+    async def main():
+        w = JobWorker(queue, concurrency=1, on_recycle=lambda: None)
+        runner = asyncio.create_task(w.run())
+        await until(started.is_set)
+        await w.drain(grace=2)
+        await runner
+
+    asyncio.run(main())
+    assert queue.get(job_id)["status"] == DONE
+
+
+def test_recycles_after_max_jobs(queue, monkeypatch):
+    handler(monkeypatch, lambda payload, interrupt: "ok")
+    for _ in range(3):
+        queue.enqueue("test", {})
+    recycled = []
+
+    async def main():
+        w = JobWorker(queue, concurrency=1, on_recycle=lambda: recycled.append(w.jobs_done))
+        w.max_jobs = 2
+        runner = asyncio.create_task(w.run())
+        await until(lambda: w.jobs_done == 3)
+        await w.drain(grace=1)
+        await runner
+        return w
+
+    w = asyncio.run(main())
+    assert recycled == [2] and w.recycling